@@ -0,0 +1,92 @@
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from . import models, reminder_schedule
+from datetime import date, timedelta
+
+# Async versions of the crud operations used by the async UI endpoints.
+# They mirror app/crud.py and must be kept in sync with it.
+
+# --- Patron Operations ---
+async def get_patron_by_username(db: AsyncSession, username: str):
+    result = await db.execute(select(models.Patron).where(models.Patron.username == username))
+    return result.scalars().first()
+
+# --- Book Operations ---
+async def get_book(db: AsyncSession, book_id: int):
+    return await db.get(models.Book, book_id)
+
+async def get_books(db: AsyncSession, skip: int = 0, limit: int = 100):
+    result = await db.execute(select(models.Book).order_by(models.Book.id).offset(skip).limit(limit))
+    return result.scalars().all()
+
+async def get_patron_books(db: AsyncSession, patron_id: int):
+    result = await db.execute(select(models.Book).where(models.Book.patron_id == patron_id))
+    return result.scalars().all()
+
+# --- Catalog Version ---
+async def get_catalog_version(db: AsyncSession) -> int:
+    state = await db.get(models.CatalogState, 1)
+    return state.version if state else 0
+
+async def bump_catalog_version(db: AsyncSession):
+    """Async version of crud.bump_catalog_version; also commits its own short transaction."""
+    result = await db.execute(
+        update(models.CatalogState).where(models.CatalogState.id == 1)
+        .values(version=models.CatalogState.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.add(models.CatalogState(id=1, version=1))
+    await db.commit()
+
+# --- Library Operations ---
+async def _apply_loan_update(db: AsyncSession, statement):
+    result = await db.execute(statement)
+    db_book = result.scalars().first()
+    if db_book is None:
+        await db.rollback()
+        return None
+    await db.commit()
+    await bump_catalog_version(db)
+    return db_book
+
+async def checkout_book(db: AsyncSession, book_id: int, patron_id: int):
+    due_date = date.today() + timedelta(days=14)
+    return await _apply_loan_update(db, update(models.Book).where(
+        models.Book.id == book_id,
+        models.Book.patron_id.is_(None)
+    ).values(
+        patron_id=patron_id,
+        due_date=due_date,
+        reminder_level=0,
+        last_reminded_on=None,
+        next_reminder_on=reminder_schedule.first_reminder_on(due_date)
+    ).returning(models.Book))
+
+async def return_book(db: AsyncSession, book_id: int):
+    return await _apply_loan_update(db, update(models.Book).where(
+        models.Book.id == book_id,
+        models.Book.patron_id.isnot(None)
+    ).values(
+        patron_id=None,
+        due_date=None,
+        reminder_level=0,
+        last_reminded_on=None,
+        next_reminder_on=None
+    ).returning(models.Book))
+
+# --- Notification Operations ---
+async def get_notifications_for_patron(db: AsyncSession, patron_id: int, only_unread: bool = False, limit: int = 20):
+    query = select(models.Notification).where(models.Notification.patron_id == patron_id)
+    if only_unread:
+        query = query.where(models.Notification.is_read == False)
+    result = await db.execute(
+        query.order_by(models.Notification.created_at.desc(), models.Notification.id.desc()).limit(limit)
+    )
+    return result.scalars().all()
+
+async def get_unread_notification_count(db: AsyncSession, patron_id: int) -> int:
+    result = await db.execute(
+        select(models.Patron.unread_notifications).where(models.Patron.id == patron_id)
+    )
+    return result.scalar() or 0
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+# Cache settings
+PATRON_CACHE_TTL = int(os.getenv("PATRON_CACHE_TTL", "60"))  # seconds
+PATRON_CACHE_SIZE = int(os.getenv("PATRON_CACHE_SIZE", "10000"))
+# When set, the cache lives in Redis and is shared by all workers
+PATRON_CACHE_REDIS_URL = os.getenv("PATRON_CACHE_REDIS_URL")
+
+@dataclass(frozen=True)
+class CachedPatron:
+    """The fields of an authenticated patron that request handlers use."""
+    id: int
+    username: str
+
+class PatronCache:
+    """
+    Cache of authenticated patrons keyed by token subject (username).
+    Uses an in-process TTL/LRU map, or Redis when a client is given.
+    Async endpoints use the *_async methods, which go through the redis.asyncio
+    client so a Redis round trip never blocks the event loop.
+    """
+
+    def __init__(self, ttl: int = PATRON_CACHE_TTL, max_size: int = PATRON_CACHE_SIZE, redis_client=None,
+                 async_redis_client=None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._redis = redis_client
+        self._async_redis = async_redis_client
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    @staticmethod
+    def _key(username: str) -> str:
+        return f"patron:{username}"
+
+    def get(self, username: str) -> Optional[CachedPatron]:
+        patron = self._get_redis(username) if self._redis is not None else self._get_local(username)
+        self._count(patron)
+        return patron
+
+    async def get_async(self, username: str) -> Optional[CachedPatron]:
+        if self._async_redis is None:
+            return self.get(username)
+        try:
+            raw = await self._async_redis.get(self._key(username))
+        except Exception as e:
+            print(f"Patron cache error: {e}")
+            self.errors += 1
+            raw = None
+        patron = CachedPatron(**json.loads(raw)) if raw else None
+        self._count(patron)
+        return patron
+
+    def _count(self, patron):
+        with self._lock:
+            if patron is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+
+    def _get_local(self, username: str):
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is None:
+                return None
+            patron, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[username]
+                return None
+            self._entries.move_to_end(username)
+            return patron
+
+    def _get_redis(self, username: str):
+        try:
+            raw = self._redis.get(self._key(username))
+        except Exception as e:
+            print(f"Patron cache error: {e}")
+            self.errors += 1
+            return None
+        return CachedPatron(**json.loads(raw)) if raw else None
+
+    def set(self, username: str, patron) -> CachedPatron:
+        """Caches a patron (ORM object or CachedPatron) and returns the cached form."""
+        cached = CachedPatron(id=patron.id, username=patron.username)
+        if self._redis is not None:
+            try:
+                self._redis.setex(self._key(username), self.ttl, json.dumps(asdict(cached)))
+            except Exception as e:
+                print(f"Patron cache error: {e}")
+                self.errors += 1
+            return cached
+        with self._lock:
+            self._entries[username] = (cached, time.monotonic() + self.ttl)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return cached
+
+    async def set_async(self, username: str, patron) -> CachedPatron:
+        if self._async_redis is None:
+            return self.set(username, patron)
+        cached = CachedPatron(id=patron.id, username=patron.username)
+        try:
+            await self._async_redis.setex(self._key(username), self.ttl, json.dumps(asdict(cached)))
+        except Exception as e:
+            print(f"Patron cache error: {e}")
+            self.errors += 1
+        return cached
+
+    async def invalidate_async(self, *usernames: str):
+        if self._async_redis is None:
+            self.invalidate(*usernames)
+            return
+        try:
+            await self._async_redis.delete(*[self._key(username) for username in usernames])
+        except Exception as e:
+            print(f"Patron cache error: {e}")
+            self.errors += 1
+
+    def invalidate(self, *usernames: str):
+        if self._redis is not None:
+            try:
+                self._redis.delete(*[self._key(username) for username in usernames])
+            except Exception as e:
+                print(f"Patron cache error: {e}")
+                self.errors += 1
+            return
+        with self._lock:
+            for username in usernames:
+                self._entries.pop(username, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.errors = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "redis" if self._redis is not None else "memory",
+                "hits": self.hits,
+                "misses": self.misses,
+                "errors": self.errors,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "size": len(self._entries) if self._redis is None else None,
+                "ttl_seconds": self.ttl,
+            }
+
+def _create_cache() -> PatronCache:
+    if PATRON_CACHE_REDIS_URL:
+        import redis
+        import redis.asyncio as aioredis
+        return PatronCache(
+            redis_client=redis.Redis.from_url(PATRON_CACHE_REDIS_URL),
+            async_redis_client=aioredis.Redis.from_url(PATRON_CACHE_REDIS_URL),
+        )
+    return PatronCache()
+
+patron_cache = _create_cache()
@@ -0,0 +1,101 @@
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+# Shared pieces of the benchmark scripts (python -m app.<name>_benchmark): a uvicorn
+# process on a free port and a pool of client threads that records request latencies.
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@contextmanager
+def run_server(env: dict = None, path: str = "/health", timeout: float = 60.0):
+    """
+    Starts uvicorn on a free port with env added to the environment, waits for a 200
+    response for path and yields (base URL, seconds to that first response).
+    """
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BASE_DIR, stdout=subprocess.DEVNULL, env={**os.environ, **(env or {})},
+    )
+    try:
+        while True:
+            if time.perf_counter() - started > timeout:
+                raise RuntimeError(f"No response from {base_url}{path} within {timeout}s")
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+            try:
+                with urllib.request.urlopen(base_url + path, timeout=1) as response:
+                    if response.status == 200:
+                        break
+            except (urllib.error.URLError, ConnectionError):
+                pass
+            time.sleep(0.01)
+        yield base_url, time.perf_counter() - started
+    finally:
+        process.terminate()
+        process.wait()
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+# Redirects are returned as responses, so each call measures a single request
+_opener = urllib.request.build_opener(_NoRedirect)
+
+def request(url: str, data: dict = None, method: str = None, headers: dict = None, timeout: float = 30.0):
+    """Sends a request with data as a form body and returns (status, parsed JSON body or None)."""
+    body = urllib.parse.urlencode(data).encode() if data is not None else None
+    req = urllib.request.Request(url, data=body, method=method, headers=headers or {})
+    try:
+        with _opener.open(req, timeout=timeout) as response:
+            status, payload = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, payload = e.code, e.read()
+    try:
+        return status, json.loads(payload)
+    except ValueError:
+        return status, None
+
+def run_clients(call, clients: int, total: int):
+    """
+    Runs call(i) for i in range(total) from clients threads.
+    Returns (elapsed seconds, [(result, latency seconds)] in call order).
+    """
+    def timed(i):
+        started = time.perf_counter()
+        result = call(i)
+        return result, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        results = list(executor.map(timed, range(total)))
+    return time.perf_counter() - started, results
+
+def percentile(samples, pct: float) -> float:
+    """Nearest-rank percentile of samples."""
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))]
+
+def latency_summary(latencies) -> str:
+    return (
+        f"p50 {statistics.median(latencies) * 1000:.0f} ms, p95 {percentile(latencies, 95) * 1000:.0f} ms, "
+        f"p99 {percentile(latencies, 99) * 1000:.0f} ms"
+    )
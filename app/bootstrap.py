@@ -0,0 +1,52 @@
+import argparse
+import os
+import sys
+import time
+
+# Prepares the database before the app, worker or beat start: applies migrations and seeds
+# the initial data. Run it once per deployment (python -m app.bootstrap), not in every
+# web worker; importing app.main does no database work.
+
+# A one-off process needs a single connection, not the web pool
+os.environ.setdefault("DB_ROLE", "script")
+
+def migrate():
+    from .migrate import upgrade_database
+    upgrade_database()
+
+def seed():
+    from . import passwords
+    from .database import SessionLocal
+    from .db_seeder import seed_db
+    db = SessionLocal()
+    try:
+        seed_db(db)
+        print("Database seeded successfully")
+    finally:
+        db.close()
+        passwords.shutdown()
+
+STEPS = {
+    "migrate": [migrate],
+    "seed": [seed],
+    "all": [migrate, seed],
+}
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Apply database migrations and seed the initial data.")
+    parser.add_argument("command", nargs="?", choices=STEPS, default="all",
+                        help="migrate, seed, or all (default)")
+    args = parser.parse_args(argv)
+
+    for step in STEPS[args.command]:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:
+            print(f"Database {step.__name__} error: {e}")
+            return 1
+        print(f"Database {step.__name__} finished in {time.perf_counter() - started:.2f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
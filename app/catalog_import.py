@@ -0,0 +1,162 @@
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from . import crud, models
+
+# Rows validated and inserted per batch
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "5000"))
+# Row errors listed in the summary; further errors are only counted
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+FORMATS = ("csv", "ndjson")
+
+class InvalidEncodingError(ValueError):
+    """The upload is not UTF-8 text; nothing from it is imported."""
+
+def detect_format(filename: str = None, content_type: str = None) -> str:
+    """Guesses the upload format from the file name or content type, defaulting to CSV."""
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or (content_type or "").endswith(("ndjson", "jsonl")):
+        return "ndjson"
+    return "csv"
+
+def iter_records(text_stream, fmt: str):
+    """Yields (line_number, record, error) for each input row without reading the whole stream."""
+    if fmt == "csv":
+        reader = csv.DictReader(text_stream)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+    for line_number, line in enumerate(text_stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, record, None
+
+def _validation_message(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors()
+    )
+
+def _insert_batch(db: Session, rows: list):
+    """Inserts validated rows with COPY on PostgreSQL and executemany elsewhere."""
+    if db.get_bind().dialect.name == "postgresql":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow((row["title"], row["author"]))
+        buffer.seek(0)
+        # Raw psycopg2 connection of the session's transaction
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert("COPY books (title, author) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+    else:
+        db.execute(insert(models.Book), rows)
+
+def import_books(db: Session, binary_stream, fmt: str = "csv", batch_size: int = IMPORT_BATCH_SIZE):
+    """
+    Streams books from a CSV (title,author header) or NDJSON file into the catalog.
+    Rows are validated against BookCreate; invalid rows are reported and skipped.
+    All valid rows are committed together at the end. Raises InvalidEncodingError,
+    after rolling back, if the file is not UTF-8.
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {fmt}")
+    started = time.perf_counter()
+    rows_read = 0
+    imported = 0
+    failed = 0
+    errors = []
+    batch = []
+    line_number = 0
+
+    text_stream = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    try:
+        for line_number, record, error in iter_records(text_stream, fmt):
+            rows_read += 1
+            if error is None:
+                try:
+                    book = models.BookCreate(title=record.get("title"), author=record.get("author"))
+                except ValidationError as e:
+                    error = _validation_message(e)
+            if error is not None:
+                failed += 1
+                if len(errors) < IMPORT_MAX_ERRORS:
+                    errors.append({"row": line_number, "error": error})
+                continue
+            batch.append({"title": book.title, "author": book.author})
+            if len(batch) >= batch_size:
+                _insert_batch(db, batch)
+                imported += len(batch)
+                batch = []
+        if batch:
+            _insert_batch(db, batch)
+            imported += len(batch)
+        db.commit()
+        if imported:
+            crud.bump_catalog_version(db)
+    except UnicodeDecodeError as e:
+        db.rollback()
+        raise InvalidEncodingError(
+            f"File is not valid UTF-8 text ({e.reason} after row {line_number}); save it as UTF-8 and retry"
+        ) from e
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        # Leave the caller's stream open
+        text_stream.detach()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "format": fmt,
+        "rows_read": rows_read,
+        "imported": imported,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors),
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(imported / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Import books from a CSV or NDJSON file.")
+    parser.add_argument("path", help="File to import (CSV with a title,author header, or NDJSON)")
+    parser.add_argument("--format", choices=FORMATS, help="Input format (default: from file extension)")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from .database import SessionLocal
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as f:
+            summary = import_books(db, f, args.format or detect_format(args.path), args.batch_size)
+    except InvalidEncodingError as e:
+        raise SystemExit(f"Import failed: {e}")
+    finally:
+        db.close()
+    for error in summary["errors"]:
+        print(f"Row {error['row']}: {error['error']}")
+    print(
+        f"Imported {summary['imported']} of {summary['rows_read']} rows "
+        f"({summary['failed']} failed) in {summary['elapsed_seconds']}s "
+        f"({summary['rows_per_second']:.0f} rows/s)"
+    )
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,10 @@ celery_app.conf.beat_schedule = {
         'task': 'app.tasks.send_overdue_reminders',
         'schedule': crontab(hour=9, minute=0),  # Run every morning at 9 AM
     },
+    'archive-old-records-daily': {
+        'task': 'app.tasks.archive_old_records',
+        'schedule': crontab(hour=3, minute=30),  # Run every night at 03:30, before the reminders
+    },
     # Weekly report is now generated manually from admin panel
     # 'generate-weekly-report': {
     #     'task': 'app.tasks.generate_weekly_report',
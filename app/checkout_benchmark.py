@@ -0,0 +1,163 @@
+import argparse
+import queue
+import threading
+from datetime import date, timedelta
+from . import crud, models
+from .benchmark import latency_summary, request, run_clients, run_server
+from .database import SessionLocal
+
+# Measures checkouts per second with many parallel clients, and counts double checkouts
+# when every client races for the same book. The HTTP run goes through
+# /api/books/{id}/checkout and /return of one uvicorn process; the in-process run compares
+# the conditional UPDATE of crud.checkout_book with the earlier read-check-write version.
+# Run `python -m app.bootstrap` first; missing books are added as "Checkout Benchmark" copies.
+
+def _read_then_write_checkout(db, book_id: int, patron_id: int):
+    """
+    The checkout before it became a single UPDATE: SELECT, check in Python, UPDATE, refresh.
+    The catalog version is bumped after the commit as crud does now, so only the loan differs.
+    """
+    db_book = crud.get_book(db, book_id)
+    if not db_book or db_book.patron_id is not None:
+        return None
+    db_book.patron_id = patron_id
+    db_book.due_date = date.today() + timedelta(days=14)
+    db.commit()
+    crud.bump_catalog_version(db)
+    db.refresh(db_book)
+    return db_book
+
+def _read_then_write_return(db, book_id: int):
+    db_book = crud.get_book(db, book_id)
+    if not db_book or db_book.patron_id is None:
+        return None
+    db_book.patron_id = None
+    db_book.due_date = None
+    db.commit()
+    crud.bump_catalog_version(db)
+    db.refresh(db_book)
+    return db_book
+
+IMPLEMENTATIONS = {
+    "conditional update": (crud.checkout_book, crud.return_book),
+    "read-then-write": (_read_then_write_checkout, _read_then_write_return),
+}
+
+def _free_books(count: int):
+    db = SessionLocal()
+    try:
+        patrons = crud.get_patrons(db, limit=1)
+        if not patrons:
+            raise RuntimeError("No patrons found; run python -m app.bootstrap first")
+        book_ids = [book.id for book in crud.get_books(db, limit=10000) if book.patron_id is None][:count]
+        # Later runs reuse these books, as the benchmark returns everything it checks out
+        for i in range(len(book_ids), count):
+            book = crud.create_book(db, models.BookCreate(title=f"Checkout Benchmark {i}", author="Benchmark"))
+            book_ids.append(book.id)
+        return book_ids, patrons[0].id
+    finally:
+        db.close()
+
+def _book_per_thread(book_ids):
+    """Returns a function giving each client thread a book of its own, so cycles never overlap on a book."""
+    free, owned = queue.SimpleQueue(), threading.local()
+    for book_id in book_ids:
+        free.put(book_id)
+
+    def book():
+        if not hasattr(owned, "book_id"):
+            owned.book_id = free.get_nowait()
+        return owned.book_id
+
+    return book
+
+def measure_http(clients: int, cycles: int):
+    """
+    Returns (checkouts per second, checkout latencies) for clients each checking out and
+    returning their own book through the API, cycles times in total.
+    """
+    book_ids, patron_id = _free_books(clients)
+    book = _book_per_thread(book_ids)
+    with run_server() as (base_url, _):
+        def call(i):
+            book_id = book()
+            started_status, _ = request(f"{base_url}/api/books/{book_id}/checkout", {"patron_id": patron_id})
+            returned_status, _ = request(f"{base_url}/api/books/{book_id}/return", {})
+            return started_status, returned_status
+
+        elapsed, results = run_clients(call, clients, cycles)
+    failed = sum(1 for statuses, _ in results if statuses != (200, 200))
+    if failed:
+        raise RuntimeError(f"{failed} of {cycles} checkout/return cycles failed")
+    return cycles / elapsed, [latency for _, latency in results]
+
+def measure_race_http(clients: int, rounds: int) -> list:
+    """Every client checks out the same book at once; returns the number of winners of each round."""
+    book_ids, patron_id = _free_books(rounds)
+    winners = []
+    with run_server() as (base_url, _):
+        for book_id in book_ids:
+            url = f"{base_url}/api/books/{book_id}/checkout"
+            _, results = run_clients(lambda i: request(url, {"patron_id": patron_id})[0], clients, clients)
+            winners.append(sum(1 for status, _ in results if status == 200))
+            request(f"{base_url}/api/books/{book_id}/return", {})
+    return winners
+
+def measure_in_process(name: str, clients: int, cycles: int, race_rounds: int):
+    """
+    Returns (checkouts per second, rounds with more than one winner) for one implementation,
+    called from clients threads with a session each.
+    """
+    checkout, return_book = IMPLEMENTATIONS[name]
+    book_ids, patron_id = _free_books(max(clients, race_rounds))
+    book = _book_per_thread(book_ids[:clients])
+
+    def cycle(i):
+        db = SessionLocal()
+        try:
+            book_id = book()
+            return checkout(db, book_id, patron_id) is not None and return_book(db, book_id) is not None
+        finally:
+            db.close()
+
+    elapsed, results = run_clients(cycle, clients, cycles)
+    if not all(ok for ok, _ in results):
+        raise RuntimeError(f"{name}: some checkout/return cycles failed")
+
+    doubled = 0
+    for book_id in book_ids[:race_rounds]:
+        def race(i):
+            db = SessionLocal()
+            try:
+                return checkout(db, book_id, patron_id) is not None
+            finally:
+                db.close()
+
+        _, results = run_clients(race, clients, clients)
+        doubled += sum(1 for won, _ in results if won) > 1
+        db = SessionLocal()
+        try:
+            crud.return_book(db, book_id)
+        finally:
+            db.close()
+    return cycles / elapsed, doubled
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure checkouts per second under parallel clients.")
+    parser.add_argument("--clients", type=int, default=16, help="Parallel clients")
+    parser.add_argument("--cycles", type=int, default=500, help="Checkout/return cycles per run")
+    parser.add_argument("--rounds", type=int, default=20, help="Rounds where every client races for one book")
+    args = parser.parse_args()
+
+    rate, latencies = measure_http(args.clients, args.cycles)
+    print(f"HTTP, {args.cycles} checkout/return cycles from {args.clients} clients: {rate:.0f} checkouts/s")
+    print(f"  cycle latency: {latency_summary(latencies)}")
+    winners = measure_race_http(args.clients, args.rounds)
+    print(f"  {args.rounds} races of {args.clients} clients for one book: {sum(n > 1 for n in winners)} double checkouts, "
+          f"{sum(n == 0 for n in winners)} without a winner")
+    for name in IMPLEMENTATIONS:
+        rate, doubled = measure_in_process(name, args.clients, args.cycles, args.rounds)
+        print(f"in-process {name:>18}: {rate:.0f} checkouts/s, {doubled} of {args.rounds} races double checked out")
+
+if __name__ == "__main__":
+    main()
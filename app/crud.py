@@ -1,19 +1,22 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import bindparam, delete, tuple_, update
+from sqlalchemy.orm import Session, joinedload
 from . import models
-from datetime import date, timedelta
-from passlib.context import CryptContext
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from datetime import date, datetime, timedelta
+import json
+from . import notification_bus, passwords, reminder_schedule
 
 def get_password_hash(password: str):
-    return pwd_context.hash(password)
+    return passwords.hash_password(password)
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    valid, _ = passwords.verify_and_update(plain_password, hashed_password)
+    return valid
 
 # --- Patron CRUD Operations ---
-def create_patron(db: Session, patron: models.PatronCreate):
-    hashed_password = get_password_hash(patron.password)
+def create_patron(db: Session, patron: models.PatronCreate, hashed_password: str = None):
+    """Creates a patron; pass hashed_password when the caller already hashed patron.password."""
+    if hashed_password is None:
+        hashed_password = get_password_hash(patron.password)
     db_patron = models.Patron(username=patron.username, hashed_password=hashed_password)
     db.add(db_patron)
     db.commit()
@@ -23,56 +26,229 @@ def create_patron(db: Session, patron: models.PatronCreate):
 def get_patron_by_username(db: Session, username: str):
     return db.query(models.Patron).filter(models.Patron.username == username).first()
 
+def update_patron(db: Session, patron: models.Patron, username: str, hashed_password: str):
+    patron.username = username
+    patron.hashed_password = hashed_password
+    db.commit()
+    db.refresh(patron)
+    return patron
+
+def update_patron_password_hash(db: Session, patron: models.Patron, hashed_password: str):
+    patron.hashed_password = hashed_password
+    db.commit()
+    return patron
+
 def get_patron(db: Session, patron_id: int):
     return db.query(models.Patron).filter(models.Patron.id == patron_id).first()
 
-def get_patrons(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Patron).offset(skip).limit(limit).all()
+def _page_by_id(query, model, skip: int, limit: int, cursor: dict = None):
+    """Pages a query by primary key: keyset when a cursor is given, OFFSET otherwise."""
+    query = query.order_by(model.id)
+    if cursor:
+        query = query.filter(model.id > cursor["id"])
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+def _page_by_sent_at(query, skip: int, limit: int, cursor: dict = None):
+    """Pages email logs newest first by (sent_at, id): keyset when a cursor is given, OFFSET otherwise."""
+    query = query.order_by(models.EmailLog.sent_at.desc(), models.EmailLog.id.desc())
+    if cursor:
+        query = query.filter(
+            tuple_(models.EmailLog.sent_at, models.EmailLog.id) < tuple_(cursor["sent_at"], cursor["id"])
+        )
+    else:
+        query = query.offset(skip)
+    return query.limit(limit).all()
+
+def get_patrons(db: Session, skip: int = 0, limit: int = 100, cursor: dict = None):
+    return _page_by_id(db.query(models.Patron), models.Patron, skip, limit, cursor)
 
 # --- Book CRUD Operations ---
 def get_book(db: Session, book_id: int):
     return db.query(models.Book).filter(models.Book.id == book_id).first()
 
-def get_books(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Book).offset(skip).limit(limit).all()
+def get_books(db: Session, skip: int = 0, limit: int = 100, cursor: dict = None):
+    return _page_by_id(db.query(models.Book), models.Book, skip, limit, cursor)
 
 def create_book(db: Session, book: models.BookCreate):
     db_book = models.Book(title=book.title, author=book.author)
     db.add(db_book)
     db.commit()
+    bump_catalog_version(db)
     db.refresh(db_book)
     return db_book
 
+# --- Catalog Version ---
+def get_catalog_version(db: Session) -> int:
+    state = db.get(models.CatalogState, 1)
+    return state.version if state else 0
+
+def bump_catalog_version(db: Session):
+    """
+    Marks the catalog as changed. Call it after the change is committed: it runs and commits
+    its own short transaction, so the catalog_state row is locked only for this one UPDATE
+    and not for the whole checkout or edit. A reader that sees the new version therefore
+    also sees the change.
+    """
+    result = db.execute(
+        update(models.CatalogState).where(models.CatalogState.id == 1)
+        .values(version=models.CatalogState.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        db.add(models.CatalogState(id=1, version=1))
+    db.commit()
+
 # --- Library Operations ---
-def checkout_book(db: Session, book_id: int, patron_id: int):
-    db_book = get_book(db, book_id)
-    if not db_book or db_book.patron_id is not None:
-        return None  # Book doesn't exist or already borrowed
-    db_book.patron_id = patron_id
-    db_book.due_date = date.today() + timedelta(days=14)
+def _apply_loan_update(db: Session, statement):
+    """
+    Runs a conditional UPDATE ... RETURNING on one book and commits it.
+    Returns the updated book, or None when the condition did not match (nothing is changed).
+    """
+    db_book = db.execute(statement).scalars().first()
+    if db_book is None:
+        db.rollback()
+        return None
+    # Keep the RETURNING values; expiring on commit would cost another SELECT
+    db.expunge(db_book)
     db.commit()
-    db.refresh(db_book)
+    bump_catalog_version(db)
     return db_book
 
+def checkout_book(db: Session, book_id: int, patron_id: int):
+    """
+    Checks a book out in a single conditional UPDATE, so concurrent checkouts cannot both succeed.
+    Returns None if the book doesn't exist or is already borrowed.
+    """
+    due_date = date.today() + timedelta(days=14)
+    return _apply_loan_update(db, update(models.Book).where(
+        models.Book.id == book_id,
+        models.Book.patron_id.is_(None)
+    ).values(
+        patron_id=patron_id,
+        due_date=due_date,
+        reminder_level=0,
+        last_reminded_on=None,
+        next_reminder_on=reminder_schedule.first_reminder_on(due_date)
+    ).returning(models.Book))
+
 def return_book(db: Session, book_id: int):
-    db_book = get_book(db, book_id)
-    if not db_book or db_book.patron_id is None:
-        return None  # Book doesn't exist or not borrowed
-    db_book.patron_id = None
-    db_book.due_date = None
-    db.commit()
-    db.refresh(db_book)
-    return db_book
+    """
+    Returns a book in a single conditional UPDATE.
+    Returns None if the book doesn't exist or is not borrowed.
+    """
+    return _apply_loan_update(db, update(models.Book).where(
+        models.Book.id == book_id,
+        models.Book.patron_id.isnot(None)
+    ).values(
+        patron_id=None,
+        due_date=None,
+        reminder_level=0,
+        last_reminded_on=None,
+        next_reminder_on=None
+    ).returning(models.Book))
 
 # --- Overdue Books ---
 def get_overdue_books(db: Session):
-    """Gets overdue books."""
+    """Gets overdue books with their patrons loaded in the same query."""
     today = date.today()
-    return db.query(models.Book).filter(
+    return db.query(models.Book).options(joinedload(models.Book.patron)).filter(
         models.Book.due_date < today,
         models.Book.patron_id.isnot(None)
     ).all()
 
+def _reminder_filters(today: date, incremental: bool):
+    """Overdue loans, or in incremental mode only the loans whose next reminder is due."""
+    if incremental:
+        return [models.Book.next_reminder_on <= today, models.Book.patron_id.isnot(None)]
+    return [models.Book.due_date < today, models.Book.patron_id.isnot(None)]
+
+def iter_overdue_books_by_patron(db: Session, batch_size: int = 1000,
+                                 first_patron_id: int = None, last_patron_id: int = None,
+                                 incremental: bool = False, today: date = None):
+    """
+    Streams books overdue on today (default: the current date) ordered by patron, with each
+    patron loaded in the same query. first_patron_id/last_patron_id limit it to an inclusive
+    patron id range; incremental limits it to loans with a reminder due (Book.next_reminder_on).
+    """
+    today = today or date.today()
+    query = db.query(models.Book).options(joinedload(models.Book.patron)).filter(
+        *_reminder_filters(today, incremental)
+    )
+    if first_patron_id is not None:
+        query = query.filter(models.Book.patron_id >= first_patron_id)
+    if last_patron_id is not None:
+        query = query.filter(models.Book.patron_id <= last_patron_id)
+    return query.order_by(models.Book.patron_id, models.Book.id).yield_per(batch_size)
+
+def iter_overdue_patron_ids(db: Session, batch_size: int = 10000, incremental: bool = False, today: date = None):
+    """Streams the ids of patrons with books overdue (or reminders due) on today in ascending order."""
+    today = today or date.today()
+    rows = db.query(models.Book.patron_id).filter(
+        *_reminder_filters(today, incremental)
+    ).distinct().order_by(models.Book.patron_id).yield_per(batch_size)
+    return (patron_id for patron_id, in rows)
+
+def mark_books_reminded(db: Session, books: list, today: date):
+    """Moves reminded loans to their next escalation step in one executemany. The caller owns the transaction."""
+    rows = []
+    for book in books:
+        level, next_reminder_on = reminder_schedule.advance(book.due_date, today)
+        rows.append({"id": book.id, "reminder_level": level, "last_reminded_on": today, "next_reminder_on": next_reminder_on})
+    if rows:
+        db.bulk_update_mappings(models.Book, rows)
+
+def get_reminder_watermark(db: Session):
+    state = db.get(models.ReminderState, 1)
+    return state.watermark if state else None
+
+def set_reminder_watermark(db: Session, day: date):
+    """Advances the incremental reminder watermark; it never moves backwards."""
+    state = db.get(models.ReminderState, 1)
+    if state is None:
+        db.add(models.ReminderState(id=1, watermark=day))
+    elif state.watermark is None or state.watermark < day:
+        state.watermark = day
+    db.commit()
+
+# --- Reminder Deliveries ---
+def claim_reminder_deliveries(db: Session, pairs: list, reminder_date: date) -> set:
+    """
+    Records (patron_id, book_id) reminders for a day and returns the pairs that were not
+    recorded before. The caller owns the transaction; claims are released if it rolls back.
+    """
+    if not pairs:
+        return set()
+    Delivery = models.ReminderDelivery
+    rows = [{"patron_id": patron_id, "book_id": book_id, "reminder_date": reminder_date} for patron_id, book_id in pairs]
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(Delivery).on_conflict_do_nothing(
+            index_elements=["patron_id", "book_id", "reminder_date"]
+        ).returning(Delivery.patron_id, Delivery.book_id)
+        return {tuple(row) for row in db.execute(statement, rows)}
+    # Other databases: not safe against concurrent claims of the same pairs
+    existing = set(db.query(Delivery.patron_id, Delivery.book_id).filter(
+        Delivery.reminder_date == reminder_date,
+        Delivery.patron_id.in_({patron_id for patron_id, _ in pairs})
+    ).all())
+    new_rows = [row for row in rows if (row["patron_id"], row["book_id"]) not in existing]
+    db.bulk_insert_mappings(Delivery, new_rows)
+    return {(row["patron_id"], row["book_id"]) for row in new_rows}
+
+def delete_reminder_deliveries_before(db: Session, reminder_date: date) -> int:
+    result = db.execute(
+        delete(models.ReminderDelivery).where(models.ReminderDelivery.reminder_date < reminder_date)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
 # --- Email Log CRUD Operations ---
 def create_email_log(db: Session, email_log: models.EmailLogCreate):
     """Creates an email sending record."""
@@ -82,15 +258,23 @@ def create_email_log(db: Session, email_log: models.EmailLogCreate):
     db.refresh(db_email_log)
     return db_email_log
 
-def get_email_logs(db: Session, skip: int = 0, limit: int = 100):
-    """Gets email sending records."""
-    return db.query(models.EmailLog).order_by(models.EmailLog.sent_at.desc()).offset(skip).limit(limit).all()
+def bulk_create_email_logs(db: Session, rows: list, return_defaults: bool = False):
+    """Inserts many email log rows at once. The caller owns the transaction.
+    With return_defaults=True the generated ids are written back into the row dicts."""
+    if rows:
+        db.bulk_insert_mappings(models.EmailLog, rows, return_defaults=return_defaults)
+
+def get_email_logs(db: Session, skip: int = 0, limit: int = 100, cursor: dict = None):
+    """Gets email sending records with their recipients loaded in the same query."""
+    query = db.query(models.EmailLog).options(joinedload(models.EmailLog.recipient))
+    return _page_by_sent_at(query, skip, limit, cursor)
 
-def get_email_logs_by_type(db: Session, email_type: str, skip: int = 0, limit: int = 100):
-    """Gets email records of specific type."""
-    return db.query(models.EmailLog).filter(
+def get_email_logs_by_type(db: Session, email_type: str, skip: int = 0, limit: int = 100, cursor: dict = None):
+    """Gets email records of specific type with their recipients loaded in the same query."""
+    query = db.query(models.EmailLog).options(joinedload(models.EmailLog.recipient)).filter(
         models.EmailLog.email_type == email_type
-    ).order_by(models.EmailLog.sent_at.desc()).offset(skip).limit(limit).all()
+    )
+    return _page_by_sent_at(query, skip, limit, cursor)
 
 def update_email_log_status(db: Session, email_id: int, status: str):
     """Updates email log status."""
@@ -101,24 +285,184 @@ def update_email_log_status(db: Session, email_id: int, status: str):
         db.refresh(db_email_log)
     return db_email_log
 
+def bulk_update_email_log_status(db: Session, statuses: list):
+    """Updates the status of many email logs from {"id", "status"} dicts. The caller owns the transaction."""
+    if statuses:
+        db.bulk_update_mappings(models.EmailLog, statuses)
+
 # --- Notification (Bildirim) CRUD ---
+# Patron.unread_notifications is updated in the same transaction as every change to
+# the patron's unread notifications, so counts never need a scan of the notifications table.
+def _adjust_unread_count(db: Session, patron_id: int, delta: int):
+    db.execute(
+        update(models.Patron).where(models.Patron.id == patron_id)
+        .values(unread_notifications=models.Patron.unread_notifications + delta)
+        .execution_options(synchronize_session=False)
+    )
+
 def create_notification(db: Session, notification: models.NotificationCreate):
     db_notification = models.Notification(**notification.dict())
     db.add(db_notification)
+    _adjust_unread_count(db, notification.patron_id, 1)
     db.commit()
     db.refresh(db_notification)
+    notification_bus.hub.publish(db_notification.patron_id, notification_bus.notification_payload(db_notification))
     return db_notification
 
-def get_notifications_for_patron(db: Session, patron_id: int, only_unread: bool = False):
+def bulk_create_notifications(db: Session, rows: list, return_defaults: bool = False):
+    """
+    Inserts many notification rows at once and bumps unread counts. The caller owns the transaction
+    and publishes the rows to the notification bus after commit.
+    With return_defaults the generated ids are set on the row dicts.
+    """
+    if not rows:
+        return
+    db.bulk_insert_mappings(models.Notification, rows, return_defaults=return_defaults)
+    new_per_patron = {}
+    for row in rows:
+        new_per_patron[row["patron_id"]] = new_per_patron.get(row["patron_id"], 0) + 1
+    adjust_unread_counts(db, new_per_patron)
+
+def adjust_unread_counts(db: Session, deltas: dict):
+    """Applies {patron_id: delta} to many unread counters in one executemany. The caller owns the transaction."""
+    if not deltas:
+        return
+    patrons = models.Patron.__table__
+    # Core statement with a parameter list: a single executemany for all patrons
+    db.execute(
+        update(patrons).where(patrons.c.id == bindparam("b_patron_id"))
+        .values(unread_notifications=patrons.c.unread_notifications + bindparam("b_count")),
+        [{"b_patron_id": patron_id, "b_count": count} for patron_id, count in deltas.items()],
+    )
+
+def get_notifications_for_patron(db: Session, patron_id: int, only_unread: bool = False,
+                                 limit: int = 20, cursor: dict = None):
+    """Gets a page of a patron's notifications, newest first, keyset paged by (created_at, id)."""
     q = db.query(models.Notification).filter(models.Notification.patron_id == patron_id)
     if only_unread:
         q = q.filter(models.Notification.is_read == False)
-    return q.order_by(models.Notification.created_at.desc()).all()
+    if cursor:
+        q = q.filter(
+            tuple_(models.Notification.created_at, models.Notification.id) < tuple_(cursor["created_at"], cursor["id"])
+        )
+    return q.order_by(models.Notification.created_at.desc(), models.Notification.id.desc()).limit(limit).all()
 
-def mark_notification_as_read(db: Session, notification_id: int):
-    notif = db.query(models.Notification).filter(models.Notification.id == notification_id).first()
-    if notif:
-        notif.is_read = True
-        db.commit()
-        db.refresh(notif)
-    return notif
\ No newline at end of file
+def get_unread_notification_count(db: Session, patron_id: int) -> int:
+    count = db.query(models.Patron.unread_notifications).filter(models.Patron.id == patron_id).scalar()
+    return count or 0
+
+def get_notifications(db: Session):
+    """Gets all notifications, newest first, with their patrons loaded in the same query."""
+    return db.query(models.Notification).options(joinedload(models.Notification.patron)).order_by(
+        models.Notification.created_at.desc()
+    ).all()
+
+def mark_notification_as_read(db: Session, notification_id: int, patron_id: int = None):
+    """Marks one notification as read. Returns False if it does not exist or was already read."""
+    statement = update(models.Notification).where(
+        models.Notification.id == notification_id,
+        models.Notification.is_read == False
+    )
+    if patron_id is not None:
+        statement = statement.where(models.Notification.patron_id == patron_id)
+    result = db.execute(
+        statement.values(is_read=True).returning(models.Notification.patron_id)
+        .execution_options(synchronize_session=False)
+    )
+    owner_id = result.scalar()
+    if owner_id is None:
+        db.rollback()
+        return False
+    _adjust_unread_count(db, owner_id, -1)
+    db.commit()
+    return True
+
+def delete_notification(db: Session, notification_id: int, patron_id: int = None):
+    """Deletes one notification. Returns False if it does not exist."""
+    statement = delete(models.Notification).where(models.Notification.id == notification_id)
+    if patron_id is not None:
+        statement = statement.where(models.Notification.patron_id == patron_id)
+    result = db.execute(
+        statement.returning(models.Notification.patron_id, models.Notification.is_read)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.first()
+    if row is None:
+        db.rollback()
+        return False
+    if not row.is_read:
+        _adjust_unread_count(db, row.patron_id, -1)
+    db.commit()
+    return True
+
+def mark_all_notifications_read(db: Session, patron_id: int) -> int:
+    """Marks all of a patron's notifications as read in one statement. Returns the number updated."""
+    result = db.execute(
+        update(models.Notification).where(
+            models.Notification.patron_id == patron_id,
+            models.Notification.is_read == False
+        ).values(is_read=True).execution_options(synchronize_session=False)
+    )
+    # Subtract what this statement marked rather than resetting to 0, so a notification
+    # committed by another transaction in the meantime stays counted
+    if result.rowcount:
+        _adjust_unread_count(db, patron_id, -result.rowcount)
+    db.commit()
+    return result.rowcount
+
+def delete_read_notifications(db: Session, patron_id: int) -> int:
+    """Deletes all of a patron's read notifications in one statement. Returns the number deleted."""
+    result = db.execute(
+        delete(models.Notification).where(
+            models.Notification.patron_id == patron_id,
+            models.Notification.is_read == True
+        ).execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount
+
+# --- Report Snapshot CRUD ---
+def create_report_snapshot(db: Session, job_id: str, report_type: str = "weekly"):
+    """Creates a pending report snapshot for the current week."""
+    today = date.today()
+    snapshot = models.ReportSnapshot(
+        job_id=job_id,
+        report_type=report_type,
+        status="pending",
+        week_start=today - timedelta(days=today.weekday()),
+    )
+    db.add(snapshot)
+    db.commit()
+    db.refresh(snapshot)
+    return snapshot
+
+def get_report_snapshot(db: Session, snapshot_id: int):
+    return db.query(models.ReportSnapshot).filter(models.ReportSnapshot.id == snapshot_id).first()
+
+def get_report_snapshot_by_job(db: Session, job_id: str):
+    return db.query(models.ReportSnapshot).filter(models.ReportSnapshot.job_id == job_id).first()
+
+def get_report_snapshots(db: Session, report_type: str = "weekly", limit: int = 12):
+    """Gets the most recent completed snapshots, newest first."""
+    return db.query(models.ReportSnapshot).filter(
+        models.ReportSnapshot.report_type == report_type,
+        models.ReportSnapshot.status == "completed"
+    ).order_by(models.ReportSnapshot.completed_at.desc()).limit(limit).all()
+
+def get_latest_report_snapshot(db: Session, report_type: str = "weekly"):
+    snapshots = get_report_snapshots(db, report_type=report_type, limit=1)
+    return snapshots[0] if snapshots else None
+
+def update_report_snapshot_status(db: Session, snapshot: models.ReportSnapshot, status: str,
+                                  data: dict = None, error: str = None):
+    """Moves a snapshot to a new status, storing the report or the error."""
+    snapshot.status = status
+    if data is not None:
+        snapshot.data = json.dumps(data, default=str)
+    if error is not None:
+        snapshot.error = error
+    if status in ("completed", "failed"):
+        snapshot.completed_at = datetime.utcnow()
+    db.commit()
+    db.refresh(snapshot)
+    return snapshot
@@ -1,8 +1,13 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 from dotenv import load_dotenv
 import os
+import threading
+import time
 
 load_dotenv()
 
@@ -26,9 +31,122 @@ else:
     SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
     print(f"Using local database URL: {SQLALCHEMY_DATABASE_URL}")
 
+# --- Connection pool configuration ---
+
+# Process role choosing the pool defaults: web (API/UI), worker (Celery worker), beat (Celery beat), script
+DB_ROLE = os.getenv("DB_ROLE", "web").lower()
+
+# Per-role defaults. The web app keeps SQLAlchemy's sizes; a Celery pool process runs one task
+# at a time and beat barely queries, so they hold few connections and ping them after idle periods.
+POOL_DEFAULTS = {
+    "web": {"POOL_SIZE": "5", "MAX_OVERFLOW": "10", "POOL_PRE_PING": "false"},
+    "worker": {"POOL_SIZE": "2", "MAX_OVERFLOW": "2", "POOL_PRE_PING": "true"},
+    "beat": {"POOL_SIZE": "1", "MAX_OVERFLOW": "0", "POOL_PRE_PING": "true"},
+    "script": {"POOL_SIZE": "1", "MAX_OVERFLOW": "0", "POOL_PRE_PING": "false"},
+}
+
+def _pool_setting(name: str, default: str = None) -> str:
+    """Reads DB_<ROLE>_<name> (one role), then DB_<name> (every role), then the role default."""
+    role_default = POOL_DEFAULTS.get(DB_ROLE, POOL_DEFAULTS["web"]).get(name, default)
+    return os.getenv(f"DB_{DB_ROLE.upper()}_{name}", os.getenv(f"DB_{name}", role_default))
+
+# "queue" keeps a pool of connections in every process; "null" opens a connection per checkout,
+# for running behind PgBouncer in transaction mode, which then does the pooling
+DB_POOL_MODE = _pool_setting("POOL_MODE", "queue").lower()
+DB_POOL_SIZE = int(_pool_setting("POOL_SIZE"))
+DB_MAX_OVERFLOW = int(_pool_setting("MAX_OVERFLOW"))
+# Seconds to wait for a free connection before raising
+DB_POOL_TIMEOUT = float(_pool_setting("POOL_TIMEOUT", "30"))
+# Connections older than this many seconds are replaced on checkout; -1 never recycles
+DB_POOL_RECYCLE = int(_pool_setting("POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = _pool_setting("POOL_PRE_PING").lower() == "true"
+
+class PoolStats:
+    """
+    Counts pool checkouts and how long they took, including the wait for a free connection.
+    Listeners are called with (name, seconds, timed_out) after every checkout.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.listeners = []
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+        for listener in self.listeners:
+            listener(self.name, seconds, timed_out)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+# engine name -> PoolStats; kept outside the pools because engine.dispose() replaces them
+pool_stats = {"sync": PoolStats("sync"), "async": PoolStats("async")}
+
+class _TimedCheckout:
+    stats_name = "sync"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats[self.stats_name].record(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_stats[self.stats_name].record(time.perf_counter() - started)
+        return connection
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedNullPool(_TimedCheckout, NullPool):
+    pass
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    stats_name = "async"
+
+class TimedAsyncNullPool(_TimedCheckout, NullPool):
+    stats_name = "async"
+
+def _engine_options(url: str, is_async: bool = False) -> dict:
+    """Gets the pool arguments of create_engine / create_async_engine for the configured role and mode."""
+    url = make_url(url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        # In-memory SQLite lives in a single connection, keep SQLAlchemy's pool for it
+        return {}
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if DB_POOL_MODE == "null":
+        options["poolclass"] = TimedAsyncNullPool if is_async else TimedNullPool
+        if is_async and url.get_driver_name() == "asyncpg":
+            # PgBouncer in transaction mode cannot keep prepared statements between transactions
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+    options.update(
+        poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
 try:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
-    print("Database engine created successfully")
+    engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_options(SQLALCHEMY_DATABASE_URL))
+    print(f"Database engine created successfully (role: {DB_ROLE}, pool: {DB_POOL_MODE})")
 except Exception as e:
     print(f"Error creating database engine: {e}")
     raise
@@ -36,10 +154,91 @@ except Exception as e:
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-# Database session dependency
+# Database session dependency. A Session checks a connection out of the pool only when its
+# first statement runs, and returns it on commit, rollback or close, so routes that declare
+# the dependency but never query do not hold a connection.
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# --- Async engine (used by the async UI endpoints) ---
+
+def _to_async_url(url: str) -> str:
+    """Maps a sync driver URL to its async driver (asyncpg for PostgreSQL, aiosqlite for SQLite)."""
+    for sync_prefix, async_prefix in (
+        ("postgresql+psycopg2://", "postgresql+asyncpg://"),
+        ("postgresql://", "postgresql+asyncpg://"),
+        ("sqlite://", "sqlite+aiosqlite://"),
+    ):
+        if url.startswith(sync_prefix):
+            return async_prefix + url[len(sync_prefix):]
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _to_async_url(SQLALCHEMY_DATABASE_URL)
+
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_engine():
+    """Creates the async engine on first use, so processes that never use it need no async driver."""
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL, is_async=True))
+    return _async_engine
+
+def get_async_sessionmaker():
+    global _AsyncSessionLocal
+    if _AsyncSessionLocal is None:
+        _AsyncSessionLocal = async_sessionmaker(
+            bind=get_async_engine(), autoflush=False, expire_on_commit=False
+        )
+    return _AsyncSessionLocal
+
+# Async database session dependency
+async def get_async_db():
+    async with get_async_sessionmaker()() as db:
+        yield db
+
+# --- Pool statistics ---
+
+def _pool_status(pool, stats: PoolStats) -> dict:
+    status = {"pool": type(pool).__name__, **stats.snapshot()}
+    if isinstance(pool, QueuePool):
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        status.update(
+            size=pool.size(),
+            checked_in=pool.checkedin(),
+            checked_out=pool.checkedout(),
+            overflow=pool.overflow(),
+            capacity=capacity,
+            saturation=round(pool.checkedout() / capacity, 3) if capacity else 0.0,
+        )
+    return status
+
+def get_pools() -> dict:
+    """Gets {engine name: pool} of the engines created in this process."""
+    pools = {"sync": engine.pool}
+    if _async_engine is not None:
+        pools["async"] = _async_engine.sync_engine.pool
+    return pools
+
+def get_pool_status() -> dict:
+    """Gets the settings, usage and checkout wait of this process's connection pools."""
+    status = {
+        "role": DB_ROLE,
+        "mode": DB_POOL_MODE,
+        "pid": os.getpid(),
+        "settings": {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pool_pre_ping": DB_POOL_PRE_PING,
+        },
+    }
+    for name, pool in get_pools().items():
+        status[name] = _pool_status(pool, pool_stats[name])
+    return status
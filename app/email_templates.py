@@ -0,0 +1,78 @@
+import json
+import threading
+from functools import lru_cache
+from jinja2 import Environment, StrictUndefined
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from . import models
+
+# Email bodies are stored once in email_templates and each EmailLog keeps only its
+# JSON parameters. Stored templates are never edited: to change a body, add a
+# template under a new name (e.g. overdue_reminder_v2), so old logs still render as sent.
+
+OVERDUE_REMINDER = "overdue_reminder_v1"
+
+TEMPLATES = {
+    OVERDUE_REMINDER: (
+        "Overdue Book Reminder",
+        """Dear {{ username }},
+
+This is a reminder that the following {{ "book is" if books|length == 1 else "books are" }} overdue:
+
+{% for title, author, due_date in books %}Book: {{ title }} by {{ author }}
+Due Date: {{ due_date }}
+
+{% endfor %}Please return {{ "this book" if books|length == 1 else "these books" }} as soon as possible to avoid any late fees.
+
+Thank you,
+Library Management System""",
+    ),
+}
+
+_environment = Environment(undefined=StrictUndefined, keep_trailing_newline=True, autoescape=False)
+
+@lru_cache(maxsize=128)
+def _compile(body: str):
+    return _environment.from_string(body)
+
+def render(body: str, params) -> str:
+    """Renders a template body with parameters given as a dict or as the stored JSON text."""
+    if isinstance(params, str):
+        params = json.loads(params)
+    return _compile(body).render(**(params or {})).strip()
+
+def render_log(message_text, template_body, params) -> str:
+    """Gets the body of an email log: the stored text of untemplated emails, otherwise the rendered template."""
+    if template_body is None:
+        return message_text
+    return render(template_body, params)
+
+def dump_params(params: dict) -> str:
+    """Serializes template parameters as compact JSON for EmailLog.params."""
+    return json.dumps(params, separators=(",", ":"), ensure_ascii=False, default=str)
+
+_template_ids = {}
+_lock = threading.Lock()
+
+def get_template_id(db: Session, name: str) -> int:
+    """Gets the id of a named template, creating its row on first use. Ids are cached per process."""
+    template_id = _template_ids.get(name)
+    if template_id is not None:
+        return template_id
+    template = db.query(models.EmailTemplate).filter(models.EmailTemplate.name == name).first()
+    if template is None:
+        subject, body = TEMPLATES[name]
+        try:
+            # Savepoint, so a concurrent insert of the same template does not abort the caller's transaction
+            with db.begin_nested():
+                template = models.EmailTemplate(name=name, subject=subject, body=body)
+                db.add(template)
+        except IntegrityError:
+            template = db.query(models.EmailTemplate).filter(models.EmailTemplate.name == name).one()
+    with _lock:
+        _template_ids[name] = template.id
+    return template.id
+
+def get_template_bodies(db: Session) -> dict:
+    """Gets {template id: body} of all templates, for rendering logs loaded without the ORM."""
+    return dict(db.query(models.EmailTemplate.id, models.EmailTemplate.body).all())
@@ -0,0 +1,119 @@
+import csv
+import io
+import json
+import os
+from datetime import date, datetime, time, timedelta
+from . import email_templates, models
+from .database import SessionLocal
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+# Rows written per chunk sent to the client
+EXPORT_CHUNK_ROWS = 500
+
+FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def _date_range(column, since: date = None, until: date = None, is_datetime: bool = False):
+    """Builds inclusive date filters; for datetime columns `until` covers the whole day."""
+    filters = []
+    if since:
+        filters.append(column >= (datetime.combine(since, time.min) if is_datetime else since))
+    if until:
+        filters.append(column < datetime.combine(until + timedelta(days=1), time.min) if is_datetime else column <= until)
+    return filters
+
+def books_query(db, since: date = None, until: date = None):
+    """All books; the date range applies to due_date."""
+    Book = models.Book
+    return db.query(
+        Book.id, Book.title, Book.author, Book.patron_id, Book.due_date
+    ).filter(*_date_range(Book.due_date, since, until)).order_by(Book.id)
+
+def loans_query(db, since: date = None, until: date = None):
+    """Currently checked out books with their borrower; the date range applies to due_date."""
+    Book, Patron = models.Book, models.Patron
+    return db.query(
+        Book.id.label("book_id"), Book.title, Book.author,
+        Patron.id.label("patron_id"), Patron.username, Book.due_date,
+    ).join(Patron, Book.patron_id == Patron.id).filter(
+        *_date_range(Book.due_date, since, until)
+    ).order_by(Book.id)
+
+def email_logs_query(db, since: date = None, until: date = None):
+    """Email logs; the date range applies to sent_at."""
+    EmailLog = models.EmailLog
+    return db.query(
+        EmailLog.id, EmailLog.recipient_id, EmailLog.email_type, EmailLog.status,
+        EmailLog.subject, EmailLog.message_text, EmailLog.template_id, EmailLog.params, EmailLog.sent_at,
+    ).filter(*_date_range(EmailLog.sent_at, since, until, is_datetime=True)).order_by(EmailLog.id)
+
+EMAIL_LOG_COLUMNS = ["id", "recipient_id", "email_type", "status", "subject", "message", "sent_at"]
+
+def email_log_records(db, rows):
+    """Replaces the stored template reference of each email log row with its rendered message."""
+    bodies = email_templates.get_template_bodies(db)
+    for row in rows:
+        record = {column: getattr(row, column) for column in EMAIL_LOG_COLUMNS if column != "message"}
+        record["message"] = email_templates.render_log(row.message_text, bodies.get(row.template_id), row.params)
+        yield {column: record[column] for column in EMAIL_LOG_COLUMNS}
+
+def _row_records(db, rows):
+    for row in rows:
+        yield dict(row._mapping)
+
+# name -> (query, rows to records, CSV columns or None to use the query's columns)
+EXPORTS = {
+    "books": (books_query, _row_records, None),
+    "loans": (loans_query, _row_records, None),
+    "emails": (email_logs_query, email_log_records, EMAIL_LOG_COLUMNS),
+}
+
+def _format_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+def _ndjson_chunks(records):
+    lines = []
+    for record in records:
+        lines.append(json.dumps({key: _format_value(value) for key, value in record.items()}))
+        if len(lines) >= EXPORT_CHUNK_ROWS:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+def _csv_chunks(records, columns):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    count = 0
+    for record in records:
+        writer.writerow([_format_value(record[column]) for column in columns])
+        count += 1
+        if count % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def stream_export(name: str, fmt: str, since: date = None, until: date = None):
+    """
+    Yields an export as text chunks, reading rows through a server-side cursor.
+    The generator owns its session, since it outlives the request's dependencies.
+    """
+    db = SessionLocal()
+    try:
+        build_query, to_records, columns = EXPORTS[name]
+        query = build_query(db, since, until)
+        columns = columns or [column["name"] for column in query.column_descriptions]
+        records = to_records(db, query.yield_per(EXPORT_BATCH_SIZE))
+        if fmt == "csv":
+            yield from _csv_chunks(records, columns)
+        else:
+            yield from _ndjson_chunks(records)
+    finally:
+        db.close()
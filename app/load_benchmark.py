@@ -0,0 +1,68 @@
+import argparse
+from .benchmark import latency_summary, request, run_clients, run_server
+
+# Measures latency percentiles of the web app under a mixed load: the async main page and
+# checkout/return endpoints, a sync JSON API and bcrypt logins, sent concurrently by many
+# clients to one uvicorn process. A blocked event loop shows up as a high p99 everywhere.
+# Run `python -m app.bootstrap` first.
+
+# (name, share of requests)
+MIX = [("main page", 5), ("book list", 2), ("checkout", 1), ("return", 1), ("login", 1)]
+
+def _schedule():
+    return [name for name, weight in MIX for _ in range(weight)]
+
+def measure_mixed_load(clients: int, total: int, username: str, password: str, env: dict = None):
+    """Returns (requests per second, {name: [latency]}, {name: failed count}) of a mixed run."""
+    schedule = _schedule()
+    with run_server(env) as (base_url, _):
+        credentials = {"username": username, "password": password}
+        status, token = request(f"{base_url}/api/auth/login", credentials)
+        if status != 200:
+            raise RuntimeError(f"Login as {username} failed with {status}; run python -m app.bootstrap first")
+        cookie = {"Cookie": f'access_token="Bearer {token["access_token"]}"'}
+        _, patrons = request(f"{base_url}/api/patrons/?limit=1000")
+        patron_id = next(patron["id"] for patron in patrons if patron["username"] == username)
+        _, books = request(f"{base_url}/api/books/?limit=50")
+        book_ids = [book["id"] for book in books]
+
+        def call(i):
+            name = schedule[i % len(schedule)]
+            book_id = book_ids[(i // len(schedule)) % len(book_ids)]
+            if name == "main page":
+                status, _ = request(f"{base_url}/", headers=cookie)
+            elif name == "book list":
+                status, _ = request(f"{base_url}/api/books/?limit=20")
+            elif name == "checkout":
+                status, _ = request(f"{base_url}/ui/checkout", {"book_id": book_id, "patron_id": patron_id})
+            elif name == "return":
+                status, _ = request(f"{base_url}/ui/return", {"book_id": book_id})
+            else:
+                status, _ = request(f"{base_url}/api/auth/login", credentials)
+            return name, status
+
+        elapsed, results = run_clients(call, clients, total)
+    latencies, failed = {}, {}
+    for (name, status), latency in results:
+        latencies.setdefault(name, []).append(latency)
+        if status >= 400:
+            failed[name] = failed.get(name, 0) + 1
+    return total / elapsed, latencies, failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure latency percentiles under a mixed request load.")
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per run")
+    parser.add_argument("--username", default="ahmet")
+    parser.add_argument("--password", default="sifre123")
+    args = parser.parse_args()
+
+    rate, latencies, failed = measure_mixed_load(args.clients, args.requests, args.username, args.password)
+    print(f"{args.requests} requests from {args.clients} clients: {rate:.0f} requests/s")
+    for name, _ in MIX:
+        errors = f", {failed[name]} failed" if failed.get(name) else ""
+        print(f"{name:>10}: {latency_summary(latencies[name])} ({len(latencies[name])} requests{errors})")
+    print(f"{'all':>10}: {latency_summary([latency for values in latencies.values() for latency in values])}")
+
+if __name__ == "__main__":
+    main()
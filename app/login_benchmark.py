@@ -0,0 +1,54 @@
+import argparse
+import os
+from .benchmark import latency_summary, request, run_clients, run_server
+
+# Measures login throughput against the number of password hashing processes: for each
+# PASSWORD_HASH_WORKERS value a fresh uvicorn serves concurrent POST /api/auth/login
+# requests for the seeded patron. 0 hashes in the web process's threadpool.
+# Run `python -m app.bootstrap` first.
+
+def _default_workers():
+    cores = os.cpu_count() or 1
+    counts = [0, 1]
+    while counts[-1] * 2 < cores:
+        counts.append(counts[-1] * 2)
+    if cores > 1:
+        counts.append(cores)
+    return counts
+
+def measure_logins(workers: int, clients: int, logins: int, username: str, password: str, rounds: int = None):
+    """Returns (logins per second, latencies) of logins requests with workers hashing processes."""
+    env = {"PASSWORD_HASH_WORKERS": str(workers)}
+    if rounds:
+        env["BCRYPT_ROUNDS"] = str(rounds)
+    with run_server(env) as (base_url, _):
+        url = f"{base_url}/api/auth/login"
+        credentials = {"username": username, "password": password}
+        # Warm-up: starts the hashing processes and upgrades a hash made with other rounds
+        status, _ = request(url, credentials)
+        if status != 200:
+            raise RuntimeError(f"Login as {username} failed with {status}; run python -m app.bootstrap first")
+        elapsed, results = run_clients(lambda i: request(url, credentials)[0], clients, logins)
+    failed = sum(1 for status, _ in results if status != 200)
+    if failed:
+        raise RuntimeError(f"{failed} of {logins} logins failed")
+    return logins / elapsed, [latency for _, latency in results]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure login throughput against password hashing processes.")
+    parser.add_argument("--workers", type=int, nargs="+", default=_default_workers(),
+                        help="PASSWORD_HASH_WORKERS values to compare (default: 0, 1, 2, ... up to the core count)")
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent clients")
+    parser.add_argument("--logins", type=int, default=200, help="Logins per run")
+    parser.add_argument("--rounds", type=int, help="BCRYPT_ROUNDS of the server (default: its environment)")
+    parser.add_argument("--username", default="ahmet")
+    parser.add_argument("--password", default="sifre123")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores, {args.clients} clients, {args.logins} logins per run")
+    for workers in args.workers:
+        rate, latencies = measure_logins(workers, args.clients, args.logins, args.username, args.password, args.rounds)
+        print(f"PASSWORD_HASH_WORKERS={workers}: {rate:.1f} logins/s, {latency_summary(latencies)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import os
+import queue
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+
+# Email settings (in real project, should be loaded from .env)
+SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USERNAME = os.getenv("SMTP_USERNAME", "your-email@gmail.com")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "your-app-password")
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+
+# Pool settings (per worker process)
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_BATCH_SIZE = int(os.getenv("SMTP_BATCH_SIZE", "50"))
+SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", "60"))
+
+# Errors that mean the connection itself is gone and should be reopened. SMTPException is an
+# OSError subclass, so handlers must catch these SMTP errors before other SMTPExceptions.
+SMTP_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)
+CONNECTION_ERRORS = SMTP_CONNECTION_ERRORS + (ConnectionError, OSError)
+
+def build_message(to_email: str, subject: str, message: str) -> str:
+    """Builds the MIME text of a plain-text email."""
+    msg = MIMEMultipart()
+    msg['From'] = SMTP_USERNAME
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(message, 'plain'))
+    return msg.as_string()
+
+def open_smtp_connection():
+    """Opens an authenticated SMTP connection using the configured server."""
+    server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    if SMTP_USE_TLS:
+        server.starttls()
+    if SMTP_USERNAME and SMTP_PASSWORD:
+        server.login(SMTP_USERNAME, SMTP_PASSWORD)
+    return server
+
+def _close_quietly(conn):
+    try:
+        conn.quit()
+    except Exception:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+class SMTPConnectionPool:
+    """
+    Bounded pool of authenticated SMTP connections.
+    Connections are reused across messages and reopened when the server drops them.
+    `connection_factory` lets tests point the pool at a local SMTP stand-in.
+    """
+
+    def __init__(self, connection_factory=open_smtp_connection, size: int = SMTP_POOL_SIZE,
+                 idle_timeout: float = SMTP_IDLE_TIMEOUT):
+        self._factory = connection_factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self.size = size
+        self.opened = 0
+        self.reconnects = 0
+
+    def _open(self):
+        conn = self._factory()
+        with self._lock:
+            self.opened += 1
+        return conn
+
+    def acquire(self):
+        """Takes a connection from the pool, opening one if none is idle."""
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    conn, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._open()
+                if time.monotonic() - last_used < self._idle_timeout:
+                    return conn
+                # Long-idle connections are usually closed by the server; check before reuse
+                try:
+                    if conn.noop()[0] == 250:
+                        return conn
+                except Exception:
+                    pass
+                _close_quietly(conn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, broken: bool = False):
+        """Returns a connection to the pool, or closes it if it is broken."""
+        try:
+            if broken or conn is None:
+                if conn is not None:
+                    _close_quietly(conn)
+            else:
+                self._idle.put((conn, time.monotonic()))
+        finally:
+            self._slots.release()
+
+    def _reconnect(self, conn):
+        if conn is not None:
+            _close_quietly(conn)
+        with self._lock:
+            self.reconnects += 1
+        return self._open()
+
+    def send_batch(self, messages):
+        """
+        Sends (to_email, subject, message) tuples back to back over one pooled connection.
+        Returns one success flag per message, in order.
+        """
+        results = []
+        conn = self.acquire()
+        try:
+            for to_email, subject, message in messages:
+                text = build_message(to_email, subject, message)
+                try:
+                    conn.sendmail(SMTP_USERNAME, to_email, text)
+                    results.append(True)
+                    continue
+                except SMTP_CONNECTION_ERRORS:
+                    pass
+                except smtplib.SMTPException as e:
+                    # Rejected message (bad recipient etc.), the connection is still usable
+                    print(f"Email sending error: {e}")
+                    results.append(False)
+                    try:
+                        conn.rset()
+                    except CONNECTION_ERRORS:
+                        conn = self._reconnect(conn)
+                    continue
+                except CONNECTION_ERRORS:
+                    pass
+                # The server dropped the connection: reopen it and retry the message once
+                try:
+                    conn = self._reconnect(conn)
+                    conn.sendmail(SMTP_USERNAME, to_email, text)
+                    results.append(True)
+                except Exception as e:
+                    print(f"Email sending error: {e}")
+                    results.append(False)
+        except Exception:
+            self.release(conn, broken=True)
+            raise
+        self.release(conn)
+        return results
+
+    def deliver(self, messages, batch_size: int = SMTP_BATCH_SIZE):
+        """
+        Sends many messages split into batches, with up to `size` batches in flight at once.
+        Returns one success flag per message, in order.
+        """
+        messages = list(messages)
+        batches = [messages[i:i + batch_size] for i in range(0, len(messages), batch_size)]
+        if not batches:
+            return []
+
+        def send(batch):
+            try:
+                return self.send_batch(batch)
+            except Exception as e:
+                print(f"Email batch error: {e}")
+                return [False] * len(batch)
+
+        with ThreadPoolExecutor(max_workers=min(self.size, len(batches))) as executor:
+            results = []
+            for batch_results in executor.map(send, batches):
+                results.extend(batch_results)
+        return results
+
+    def close(self):
+        """Closes all idle connections."""
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            _close_quietly(conn)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool() -> SMTPConnectionPool:
+    """Returns the SMTP pool of this worker process, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SMTPConnectionPool()
+    return _pool
@@ -1,43 +1,36 @@
-from fastapi import FastAPI, Depends, HTTPException, Request, Form, Cookie, Path, status
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi import FastAPI, Depends, HTTPException, Request, Form, Cookie, Path, Query, File, UploadFile, status
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
 from datetime import datetime, timedelta, date
-from . import crud, models, tasks
-from .database import engine, get_db
-from .db_seeder import seed_db # NEW: Import the data seeding function
+from . import async_crud, catalog_import, crud, exports, models, notification_bus, page_cache, metrics, pagination, passwords, reports, search, sql_profiler
+from .auth_cache import patron_cache
 from starlette.responses import Response
-from .database import engine, get_db, SessionLocal
+from .database import get_db, get_async_db, get_async_sessionmaker, get_pool_status
+import json
 import os
+import uuid
 
 # Import other modules from the project
 
 # --- Application Setup and Initial Configuration ---
 
-# 1. Tell SQLAlchemy to create database tables.
-#    If tables already exist, it won't do anything.
-try:
-    models.Base.metadata.create_all(bind=engine)
-    print("Database tables created successfully")
-except Exception as e:
-    print(f"Error creating database tables: {e}")
-
-# 2. Create FastAPI application
+# 1. Create FastAPI application. Importing this module does no database work: migrations
+#    and seed data are applied once per deployment with `python -m app.bootstrap`, and the
+#    Celery task module is imported by the endpoints that queue tasks.
 app = FastAPI(title="Library Management System")
 
-# 3. Seed database with initial data
-try:
-    db = SessionLocal()
-    seed_db(db)
-    print("Database seeded successfully")
-except Exception as e:
-    print(f"Error seeding database: {e}")
-finally:
-    if 'db' in locals():
-        db.close()
+# 2. Record request latency, status codes and SQL statements for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# 3. Profile the SQL statements of sampled requests (opt-in, see /admin/sql-profiles)
+if sql_profiler.SQL_PROFILER_ENABLED:
+    sql_profiler.install(app)
 
 # 4. Configure Jinja2 to use HTML templates
 #    This will look for the 'templates' folder in the project root.
@@ -46,12 +39,32 @@ templates = Jinja2Templates(directory="templates")
 SECRET_KEY = "supersecretkey"  # In real project, should be loaded from .env
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60
+# Newest notifications shown on the main page; the full inbox is paged through /api/notifications/
+MAIN_PAGE_NOTIFICATIONS = 10
+
+@app.on_event("shutdown")
+def shutdown_password_pool():
+    passwords.shutdown()
+
+@app.on_event("shutdown")
+async def shutdown_notification_hub():
+    await notification_bus.hub.close()
+
+@app.on_event("shutdown")
+def shutdown_metrics():
+    metrics.mark_process_dead()
 
 # Health check endpoint for Railway
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "message": "Library Management System is running"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """Prometheus metrics of the web workers (and of the Celery workers sharing PROMETHEUS_MULTIPROC_DIR)."""
+    data, content_type = metrics.render_latest()
+    return Response(content=data, media_type=content_type)
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
@@ -61,6 +74,26 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
+def resolve_patron(db: Session, username: str):
+    """Finds the patron for a token subject, going to the database only on a cache miss."""
+    patron = patron_cache.get(username)
+    if patron is None:
+        db_patron = crud.get_patron_by_username(db, username=username)
+        if db_patron is None:
+            return None
+        patron = patron_cache.set(username, db_patron)
+    return patron
+
+async def resolve_patron_async(db: AsyncSession, username: str):
+    """Async version of resolve_patron for endpoints using the async session."""
+    patron = await patron_cache.get_async(username)
+    if patron is None:
+        db_patron = await async_crud.get_patron_by_username(db, username)
+        if db_patron is None:
+            return None
+        patron = await patron_cache.set_async(username, db_patron)
+    return patron
+
 # Helper function to find user from token
 def get_current_patron(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
@@ -75,55 +108,114 @@ def get_current_patron(token: str = Depends(oauth2_scheme), db: Session = Depend
             raise credentials_exception
     except JWTError:
         raise credentials_exception
-    patron = crud.get_patron_by_username(db, username=username)
+    patron = resolve_patron(db, username)
     if patron is None:
         raise credentials_exception
     return patron
 
+async def get_cookie_patron_async(db: AsyncSession, access_token: Optional[str]):
+    """Finds the patron of the UI session cookie, or None if it is missing or invalid."""
+    if not access_token:
+        return None
+    try:
+        token = access_token.replace("Bearer ", "")
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        username = payload.get("sub")
+        if username:
+            return await resolve_patron_async(db, username)
+    except Exception:
+        return None
+    return None
+
+def parse_cursor(cursor: Optional[str], keys=("id",)):
+    try:
+        return pagination.decode_cursor(cursor, keys)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+EMAIL_CURSOR_KEYS = ("sent_at", "id")
+
+def paginated(response: Response, rows, limit: int, cursor: Optional[str], page_model, key_func=pagination.id_key):
+    """
+    Builds a list response. The next cursor is always sent in the X-Next-Cursor header;
+    clients that passed `cursor` get a {items, next_cursor} page instead of a bare list.
+    """
+    next_cursor = pagination.next_cursor(rows, limit, key_func)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    if cursor is None:
+        return rows
+    return page_model(items=rows, next_cursor=next_cursor)
+
+async def get_catalog_fragment(db: AsyncSession, version: int) -> str:
+    """Gets the rendered book list of a catalog version, rendering it on a cache miss."""
+    fragment = page_cache.catalog_fragments.get(version)
+    if fragment is None:
+        books = await async_crud.get_books(db)
+        fragment = templates.get_template("_catalog.html").render(
+            books=books, patron_id=page_cache.PATRON_ID_PLACEHOLDER
+        )
+        page_cache.catalog_fragments.set(version, fragment)
+    return fragment
+
 # --- HTML Interface (UI) Endpoints ---
 
 @app.get("/", response_class=HTMLResponse, tags=["Interface"])
-async def show_main_page(request: Request, db: Session = Depends(get_db), access_token: str = Cookie(default=None)):
+async def show_main_page(request: Request, db: AsyncSession = Depends(get_async_db), access_token: str = Cookie(default=None)):
     """
     Shows the main management panel (index.html).
-    Fetches all books and members from database and sends them to the template.
-    Also shows books borrowed by the logged-in user.
+    The book list is a cached fragment re-rendered only when the catalog version changes;
+    the borrowed books and notifications of the logged-in user are rendered per request.
+    Responses carry an ETag computed from the data the page shows, so unchanged pages are
+    answered with 304 without rendering the template.
     """
-    all_books = crud.get_books(db)
-    patron = None
     patron_books = []
     patron_id = None
     notifications = []
-    if access_token:
-        try:
-            token = access_token.replace("Bearer ", "")
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-            username = payload.get("sub")
-            if username:
-                patron = crud.get_patron_by_username(db, username=username)
-        except Exception:
-            patron = None
+    unread_count = 0
+    catalog_version = None
+    catalog_html = ""
+    patron = await get_cookie_patron_async(db, access_token)
     if patron:
         patron_id = patron.id
-        patron_books = db.query(models.Book).filter_by(patron_id=patron_id).all()
-        notifications = crud.get_notifications_for_patron(db, patron_id)
+        patron_books = await async_crud.get_patron_books(db, patron_id)
+        notifications = await async_crud.get_notifications_for_patron(db, patron_id, limit=MAIN_PAGE_NOTIFICATIONS)
+        unread_count = await async_crud.get_unread_notification_count(db, patron_id)
+        catalog_version = await async_crud.get_catalog_version(db)
     today = date.today()
-    return templates.TemplateResponse(
+    etag = page_cache.state_etag(
+        page_cache.template_version(templates.env, "index.html", "_catalog.html"),
+        today,
+        (patron.id, patron.username) if patron else None,
+        catalog_version,
+        unread_count,
+        [(book.id, book.title, book.author, book.due_date) for book in patron_books],
+        [(notif.id, notif.is_read) for notif in notifications],
+    )
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if page_cache.etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if patron:
+        catalog_html = page_cache.personalize_catalog(await get_catalog_fragment(db, catalog_version), patron_id)
+    response = templates.TemplateResponse(
         "index.html",
         {
             "request": request,
-            "books": all_books,
             "patron": patron,
             "patron_books": patron_books,
             "patron_id": patron_id,
             "today": today,
             "notifications": notifications,
+            "unread_count": unread_count,
+            "catalog_html": catalog_html,
         }
     )
+    response.headers.update(headers)
+    return response
 
 @app.post("/ui/checkout", tags=["Interface"])
 async def ui_checkout_book(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     book_id: int = Form(...),
     patron_id: int = Form(...)
 ):
@@ -131,27 +223,42 @@ async def ui_checkout_book(
     Performs book checkout operation with data from HTML interface form.
     Redirects user to main page after operation.
     """
-    crud.checkout_book(db=db, book_id=book_id, patron_id=patron_id)
+    await async_crud.checkout_book(db=db, book_id=book_id, patron_id=patron_id)
     return RedirectResponse(url="/", status_code=303)
 
 
 @app.post("/ui/return", tags=["Interface"])
-async def ui_return_book(db: Session = Depends(get_db), book_id: int = Form(...)):
+async def ui_return_book(db: AsyncSession = Depends(get_async_db), book_id: int = Form(...)):
     """
     Performs book return operation with data from HTML interface form.
     Redirects user to main page after operation.
     """
-    crud.return_book(db=db, book_id=book_id)
+    await async_crud.return_book(db=db, book_id=book_id)
     return RedirectResponse(url="/", status_code=303)
 
 @app.get("/login", response_class=HTMLResponse, tags=["Interface"])
 def login_form(request: Request):
     return templates.TemplateResponse("login.html", {"request": request, "error": None})
 
+async def authenticate_patron(db: Session, username: str, password: str):
+    """
+    Checks credentials with bcrypt running on the password process pool.
+    Hashes made with outdated settings (e.g. a lower BCRYPT_ROUNDS) are re-hashed and saved.
+    """
+    patron = await run_in_threadpool(crud.get_patron_by_username, db, username)
+    if patron is None:
+        return None
+    valid, new_hash = await passwords.verify_and_update_async(password, patron.hashed_password)
+    if not valid:
+        return None
+    if new_hash:
+        await run_in_threadpool(crud.update_patron_password_hash, db, patron, new_hash)
+    return patron
+
 @app.post("/login", response_class=HTMLResponse, tags=["Interface"])
-def login_submit(request: Request, username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
-    patron = crud.get_patron_by_username(db, username=username)
-    if not patron or not crud.verify_password(password, patron.hashed_password):
+async def login_submit(request: Request, username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
+    patron = await authenticate_patron(db, username, password)
+    if not patron:
         return templates.TemplateResponse("login.html", {"request": request, "error": "Invalid username or password."})
     access_token = create_access_token(data={"sub": patron.username})
     # If admin user, redirect to admin panel
@@ -166,13 +273,21 @@ def login_submit(request: Request, username: str = Form(...), password: str = Fo
 def register_form(request: Request):
     return templates.TemplateResponse("register.html", {"request": request, "error": None})
 
+async def register_patron(db: Session, patron: models.PatronCreate):
+    """
+    Creates a patron with the password hashed on the password process pool.
+    Returns None when the username is already taken.
+    """
+    if await run_in_threadpool(crud.get_patron_by_username, db, patron.username):
+        return None
+    hashed_password = await passwords.hash_password_async(patron.password)
+    return await run_in_threadpool(crud.create_patron, db, patron, hashed_password)
+
 @app.post("/register", response_class=HTMLResponse, tags=["Interface"])
-def register_submit(request: Request, username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
-    db_patron = crud.get_patron_by_username(db, username=username)
-    if db_patron:
-        return templates.TemplateResponse("register.html", {"request": request, "error": "This username is already taken."})
+async def register_submit(request: Request, username: str = Form(...), password: str = Form(...), db: Session = Depends(get_db)):
     patron = models.PatronCreate(username=username, password=password)
-    crud.create_patron(db, patron)
+    if await register_patron(db, patron) is None:
+        return templates.TemplateResponse("register.html", {"request": request, "error": "This username is already taken."})
     response = RedirectResponse(url="/login", status_code=303)
     return response
 
@@ -194,11 +309,47 @@ def create_book_api(book: models.BookCreate, db: Session = Depends(get_db)):
     """Creates a new book via API."""
     return crud.create_book(db=db, book=book)
 
-@app.get("/api/books/", response_model=List[models.BookResponse], tags=["API - Books"])
-def get_all_books_api(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Lists all books via API."""
-    books = crud.get_books(db=db, skip=skip, limit=limit)
-    return books
+@app.post("/api/books/import", response_model=models.BookImportSummary, tags=["API - Books"])
+def import_books_api(file: UploadFile = File(...), format: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Bulk imports books from a CSV (title,author header) or NDJSON upload.
+    The upload is streamed from its spooled temporary file and inserted in batches.
+    """
+    fmt = format or catalog_import.detect_format(file.filename, file.content_type)
+    if fmt not in catalog_import.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {fmt}")
+    try:
+        return catalog_import.import_books(db, file.file, fmt)
+    except catalog_import.InvalidEncodingError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/books/", response_model=Union[List[models.BookResponse], models.BookPage], tags=["API - Books"])
+def get_all_books_api(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                      db: Session = Depends(get_db)):
+    """Lists all books via API. Pass `cursor` (empty for the first page) to page with cursors."""
+    books = crud.get_books(db=db, skip=skip, limit=limit, cursor=parse_cursor(cursor))
+    return paginated(response, books, limit, cursor, models.BookPage)
+
+@app.get("/api/books/search", response_model=models.BookSearchPage, tags=["API - Books"])
+def search_books_api(q: str, mode: str = "fulltext", available: Optional[bool] = None,
+                     limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0),
+                     db: Session = Depends(get_db)):
+    """
+    Searches books by title and author, best matches first.
+    `mode` is fulltext, prefix (search-as-you-type) or fuzzy (typo tolerant);
+    `available` limits results to books on the shelf (true) or checked out (false).
+    """
+    if mode not in search.SEARCH_MODES:
+        raise HTTPException(status_code=400, detail=f"Unsupported search mode: {mode}")
+    results = search.search_books(db, q, mode=mode, available=available, limit=limit, offset=offset)
+    items = [
+        models.BookSearchResult(
+            id=book.id, title=book.title, author=book.author,
+            patron_id=book.patron_id, due_date=book.due_date, rank=float(rank or 0),
+        )
+        for book, rank in results
+    ]
+    return models.BookSearchPage(items=items, next_offset=offset + limit if len(items) == limit else None)
 
 @app.get("/api/books/{book_id}", response_model=models.BookResponse, tags=["API - Books"])
 def get_book_by_id_api(book_id: int, db: Session = Depends(get_db)):
@@ -217,6 +368,7 @@ def update_book_api(book_id: int, book: models.BookCreate, db: Session = Depends
     db_book.title = book.title
     db_book.author = book.author
     db.commit()
+    crud.bump_catalog_version(db)
     db.refresh(db_book)
     return db_book
 
@@ -227,6 +379,7 @@ def delete_book_api(book_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Book not found")
     db.delete(db_book)
     db.commit()
+    crud.bump_catalog_version(db)
     return
 
 # --- Member (Patron) API Endpoints ---
@@ -240,11 +393,12 @@ def create_patron_api(patron: models.PatronCreate, db: Session = Depends(get_db)
         raise HTTPException(status_code=400, detail="A member with this name already exists")
     return crud.create_patron(db=db, patron=patron)
 
-@app.get("/api/patrons/", response_model=List[models.PatronResponse], tags=["API - Users"])
-def get_all_patrons_api(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Lists all library members via API."""
-    patrons = crud.get_patrons(db=db, skip=skip, limit=limit)
-    return patrons
+@app.get("/api/patrons/", response_model=Union[List[models.PatronResponse], models.PatronPage], tags=["API - Users"])
+def get_all_patrons_api(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                        db: Session = Depends(get_db)):
+    """Lists all library members via API. Pass `cursor` (empty for the first page) to page with cursors."""
+    patrons = crud.get_patrons(db=db, skip=skip, limit=limit, cursor=parse_cursor(cursor))
+    return paginated(response, patrons, limit, cursor, models.PatronPage)
 
 # --- Patron Read by ID, Update, Delete ---
 @app.get("/api/patrons/{patron_id}", response_model=models.PatronResponse, tags=["API - Users"])
@@ -255,14 +409,14 @@ def get_patron_by_id_api(patron_id: int, db: Session = Depends(get_db)):
     return db_patron
 
 @app.put("/api/patrons/{patron_id}", response_model=models.PatronResponse, tags=["API - Users"])
-def update_patron_api(patron_id: int, patron: models.PatronCreate, db: Session = Depends(get_db)):
-    db_patron = crud.get_patron(db, patron_id)
+async def update_patron_api(patron_id: int, patron: models.PatronCreate, db: Session = Depends(get_db)):
+    db_patron = await run_in_threadpool(crud.get_patron, db, patron_id)
     if not db_patron:
         raise HTTPException(status_code=404, detail="Patron not found")
-    db_patron.username = patron.username
-    db_patron.hashed_password = crud.get_password_hash(patron.password)
-    db.commit()
-    db.refresh(db_patron)
+    old_username = db_patron.username
+    hashed_password = await passwords.hash_password_async(patron.password)
+    db_patron = await run_in_threadpool(crud.update_patron, db, db_patron, patron.username, hashed_password)
+    await patron_cache.invalidate_async(old_username, db_patron.username)
     return db_patron
 
 @app.delete("/api/patrons/{patron_id}", status_code=204, tags=["API - Users"])
@@ -272,25 +426,63 @@ def delete_patron_api(patron_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Patron not found")
     db.delete(db_patron)
     db.commit()
+    patron_cache.invalidate(db_patron.username)
     return
 
 # --- Auth API Endpoints ---
 
 @app.post("/api/auth/register", response_model=models.PatronResponse, tags=["Auth"])
-def register_patron_api(patron: models.PatronCreate, db: Session = Depends(get_db)):
-    db_patron = crud.get_patron_by_username(db, username=patron.username)
-    if db_patron:
+async def register_patron_api(patron: models.PatronCreate, db: Session = Depends(get_db)):
+    db_patron = await register_patron(db, patron)
+    if db_patron is None:
         raise HTTPException(status_code=400, detail="This username is already taken.")
-    return crud.create_patron(db, patron)
+    return db_patron
 
 @app.post("/api/auth/login", tags=["Auth"])
-def login_patron_api(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    patron = crud.get_patron_by_username(db, username=form_data.username)
-    if not patron or not crud.verify_password(form_data.password, patron.hashed_password):
+async def login_patron_api(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    patron = await authenticate_patron(db, form_data.username, form_data.password)
+    if not patron:
         raise HTTPException(status_code=400, detail="Invalid username or password.")
     access_token = create_access_token(data={"sub": patron.username})
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.get("/api/auth/patron-cache", tags=["Auth"])
+def patron_cache_stats_api():
+    """Shows hit/miss counters of the authenticated patron cache."""
+    return patron_cache.stats()
+
+@app.get("/api/db/pool", tags=["Database"])
+def database_pool_api():
+    """Shows the pool settings, connections in use and checkout wait times of this worker."""
+    return get_pool_status()
+
+# --- Export API Endpoints ---
+
+def export_response(name: str, format: str, since: Optional[date], until: Optional[date]):
+    if format not in exports.FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    extension = "ndjson" if format == "ndjson" else "csv"
+    return StreamingResponse(
+        exports.stream_export(name, format, since, until),
+        media_type=exports.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{extension}"'},
+    )
+
+@app.get("/api/export/books", tags=["API - Export"])
+def export_books_api(format: str = "ndjson", since: Optional[date] = None, until: Optional[date] = None):
+    """Streams all books as NDJSON or CSV. `since`/`until` filter on due_date."""
+    return export_response("books", format, since, until)
+
+@app.get("/api/export/loans", tags=["API - Export"])
+def export_loans_api(format: str = "ndjson", since: Optional[date] = None, until: Optional[date] = None):
+    """Streams current loans with their borrowers as NDJSON or CSV. `since`/`until` filter on due_date."""
+    return export_response("loans", format, since, until)
+
+@app.get("/api/export/emails", tags=["API - Export"])
+def export_email_logs_api(format: str = "ndjson", since: Optional[date] = None, until: Optional[date] = None):
+    """Streams email logs as NDJSON or CSV. `since`/`until` filter on sent_at."""
+    return export_response("emails", format, since, until)
+
 # --- Task API Endpoints ---
 
 @app.post("/api/tasks/send-reminders", tags=["API - Tasks"])
@@ -304,21 +496,22 @@ def trigger_reminders_api():
 
 @app.post("/api/books/{book_id}/checkout", response_model=models.BookResponse, tags=["API - Books"])
 def api_checkout_book(book_id: int, patron_id: int = Form(...), db: Session = Depends(get_db)):
-    db_book = crud.get_book(db, book_id)
-    if not db_book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    if db_book.patron_id is not None:
+    db_book = crud.checkout_book(db, book_id, patron_id)
+    if db_book is None:
+        # Only the failure path needs to know why the conditional update matched nothing
+        if crud.get_book(db, book_id) is None:
+            raise HTTPException(status_code=404, detail="Book not found")
         raise HTTPException(status_code=400, detail="Book is already checked out")
-    return crud.checkout_book(db, book_id, patron_id)
+    return db_book
 
 @app.post("/api/books/{book_id}/return", response_model=models.BookResponse, tags=["API - Books"])
 def api_return_book(book_id: int, db: Session = Depends(get_db)):
-    db_book = crud.get_book(db, book_id)
-    if not db_book:
-        raise HTTPException(status_code=404, detail="Book not found")
-    if db_book.patron_id is None:
+    db_book = crud.return_book(db, book_id)
+    if db_book is None:
+        if crud.get_book(db, book_id) is None:
+            raise HTTPException(status_code=404, detail="Book not found")
         raise HTTPException(status_code=400, detail="Book is already in library")
-    return crud.return_book(db, book_id)
+    return db_book
 
 @app.get("/api/books/checked-out", response_model=List[models.BookResponse], tags=["API - Books"])
 def get_checked_out_books_api(db: Session = Depends(get_db)):
@@ -383,6 +576,7 @@ def admin_delete_book(request: Request, book_id: int = Path(...), db: Session =
     if book:
         db.delete(book)
         db.commit()
+        crud.bump_catalog_version(db)
     return RedirectResponse(url="/admin", status_code=303)
 
 @app.get("/admin/books/edit/{book_id}", response_class=HTMLResponse, tags=["Admin"])
@@ -397,6 +591,7 @@ def admin_edit_book(request: Request, book_id: int = Path(...), title: str = For
         book.title = title
         book.author = author
         db.commit()
+        crud.bump_catalog_version(db)
     return RedirectResponse(url="/admin", status_code=303)
 
 # --- Email Management Endpoints ---
@@ -414,78 +609,177 @@ def admin_email_logs(request: Request, db: Session = Depends(get_db)):
     })
 
 @app.post("/admin/send-overdue-reminders", response_class=HTMLResponse, tags=["Admin"])
-def admin_send_overdue_reminders(request: Request, db: Session = Depends(get_db)):
+def admin_send_overdue_reminders(request: Request):
     """Manually triggers overdue book reminders."""
     from .tasks import send_overdue_reminders
     # Manually trigger Celery task
     send_overdue_reminders.delay()
     return RedirectResponse(url="/admin", status_code=303)
 
-@app.post("/admin/send-weekly-report", response_class=HTMLResponse, tags=["Admin"])
-def admin_send_weekly_report(request: Request, db: Session = Depends(get_db)):
-    """Manually generates weekly report and shows it in admin panel."""
+def enqueue_weekly_report(db: Session):
+    """Creates a pending report snapshot and queues its generation. Returns the snapshot."""
     from .tasks import generate_weekly_report
-    # Manually trigger Celery task
-    task_result = generate_weekly_report.delay()
-    
-    # Wait for task result and get report data
+    snapshot = crud.create_report_snapshot(db, uuid.uuid4().hex)
     try:
-        report_data = task_result.get(timeout=10)  # Wait 10 seconds
-        return RedirectResponse(url=f"/admin/weekly-report?data={report_data}", status_code=303)
-    except:
+        generate_weekly_report.apply_async(args=[snapshot.job_id], task_id=snapshot.job_id)
+    except Exception as e:
+        print(f"Error queuing weekly report: {e}")
+        crud.update_report_snapshot_status(db, snapshot, "failed", error=str(e))
+    return snapshot
+
+def report_job_response(snapshot: models.ReportSnapshot):
+    return models.ReportJobResponse(
+        job_id=snapshot.job_id,
+        status=snapshot.status,
+        week_start=snapshot.week_start,
+        created_at=snapshot.created_at,
+        completed_at=snapshot.completed_at,
+        error=snapshot.error,
+        report=json.loads(snapshot.data) if snapshot.data else None,
+    )
+
+@app.post("/admin/send-weekly-report", response_class=HTMLResponse, tags=["Admin"])
+def admin_send_weekly_report(request: Request, db: Session = Depends(get_db)):
+    """Queues weekly report generation and redirects to the report page, which polls the job."""
+    snapshot = enqueue_weekly_report(db)
+    if snapshot.status == "failed":
         return RedirectResponse(url="/admin?error=report_generation_failed", status_code=303)
+    return RedirectResponse(url=f"/admin/weekly-report?job={snapshot.job_id}", status_code=303)
 
 @app.get("/admin/weekly-report", response_class=HTMLResponse, tags=["Admin"])
-def admin_weekly_report(request: Request, db: Session = Depends(get_db)):
-    """Shows weekly report in admin panel."""
-    # Calculate report data
-    all_books = crud.get_books(db)
-    checked_out_books = [book for book in all_books if book.patron_id is not None]
-    overdue_books = crud.get_overdue_books(db)
-    
-    # Weekly statistics (last 7 days)
-    from datetime import timedelta
-    week_ago = date.today() - timedelta(days=7)
-    
-    # Books borrowed in last 7 days
-    recent_checkouts = db.query(models.Book).filter(
-        models.Book.patron_id.isnot(None),
-        models.Book.due_date >= week_ago
-    ).all()
-    
-    report_data = {
-        "total_books": len(all_books),
-        "checked_out_books": len(checked_out_books),
-        "overdue_books": len(overdue_books),
-        "available_books": len(all_books) - len(checked_out_books),
-        "checkout_rate": f"{(len(checked_out_books) / len(all_books) * 100):.1f}%" if all_books else "0%",
-        "recent_checkouts": len(recent_checkouts),
-        "generated_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        "overdue_books_list": overdue_books,
-        "recent_checkouts_list": recent_checkouts
-    }
-    
+def admin_weekly_report(request: Request, snapshot_id: Optional[int] = None, job: Optional[str] = None,
+                        db: Session = Depends(get_db)):
+    """Shows the latest (or a selected) weekly report snapshot in admin panel."""
+    history = crud.get_report_snapshots(db)
+    snapshot = crud.get_report_snapshot(db, snapshot_id) if snapshot_id else (history[0] if history else None)
+    report_data = json.loads(snapshot.data) if snapshot and snapshot.data else None
+
+    # Compare against the snapshot generated before the one shown
+    previous_data = None
+    if snapshot:
+        older = [s for s in history if s.completed_at and snapshot.completed_at and s.completed_at < snapshot.completed_at]
+        if older:
+            previous_data = json.loads(older[0].data)
+
+    pending_job = crud.get_report_snapshot_by_job(db, job) if job else None
+    if pending_job and pending_job.status == "completed":
+        pending_job = None
+
     return templates.TemplateResponse("admin_weekly_report.html", {
         "request": request,
         "report": report_data,
+        "snapshot": snapshot,
+        "trend": reports.report_trend(report_data, previous_data),
+        "history": [(s, json.loads(s.data)) for s in history],
+        "pending_job": pending_job,
     })
 
+# --- Report Job API Endpoints ---
+
+@app.post("/api/reports/weekly", response_model=models.ReportJobResponse, status_code=202, tags=["API - Reports"])
+def create_weekly_report_job_api(db: Session = Depends(get_db)):
+    """Queues weekly report generation and returns its job id right away."""
+    return report_job_response(enqueue_weekly_report(db))
+
+@app.get("/api/reports/jobs/{job_id}", response_model=models.ReportJobResponse, tags=["API - Reports"])
+def get_report_job_api(job_id: str, db: Session = Depends(get_db)):
+    """Gets the status of a report job, with the report once it is completed."""
+    snapshot = crud.get_report_snapshot_by_job(db, job_id)
+    if snapshot is None:
+        raise HTTPException(status_code=404, detail="Report job not found")
+    return report_job_response(snapshot)
+
+@app.get("/api/reports/weekly", response_model=List[models.ReportJobResponse], tags=["API - Reports"])
+def get_weekly_reports_api(limit: int = 12, db: Session = Depends(get_db)):
+    """Lists completed weekly report snapshots, newest first, for trend comparison."""
+    return [report_job_response(snapshot) for snapshot in crud.get_report_snapshots(db, limit=limit)]
+
 # --- API Endpoints for Email Logs ---
 
-@app.get("/api/emails/", response_model=List[models.EmailLogResponse], tags=["API - Emails"])
-def get_email_logs_api(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Lists email logs via API."""
-    return crud.get_email_logs(db, skip=skip, limit=limit)
+@app.get("/api/emails/", response_model=Union[List[models.EmailLogResponse], models.EmailLogPage], tags=["API - Emails"])
+def get_email_logs_api(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                       db: Session = Depends(get_db)):
+    """Lists email logs via API. Pass `cursor` (empty for the first page) to page with cursors."""
+    email_logs = crud.get_email_logs(db, skip=skip, limit=limit, cursor=parse_cursor(cursor, EMAIL_CURSOR_KEYS))
+    return paginated(response, email_logs, limit, cursor, models.EmailLogPage, pagination.sent_at_key)
 
-@app.get("/api/emails/overdue-reminders", response_model=List[models.EmailLogResponse], tags=["API - Emails"])
-def get_overdue_reminder_emails_api(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@app.get("/api/emails/overdue-reminders", response_model=Union[List[models.EmailLogResponse], models.EmailLogPage], tags=["API - Emails"])
+def get_overdue_reminder_emails_api(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                                    db: Session = Depends(get_db)):
     """Lists overdue book reminder emails via API."""
-    return crud.get_email_logs_by_type(db, "overdue_reminder", skip=skip, limit=limit)
+    email_logs = crud.get_email_logs_by_type(db, "overdue_reminder", skip=skip, limit=limit, cursor=parse_cursor(cursor, EMAIL_CURSOR_KEYS))
+    return paginated(response, email_logs, limit, cursor, models.EmailLogPage, pagination.sent_at_key)
 
-@app.get("/api/emails/weekly-reports", response_model=List[models.EmailLogResponse], tags=["API - Emails"])
-def get_weekly_report_emails_api(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+@app.get("/api/emails/weekly-reports", response_model=Union[List[models.EmailLogResponse], models.EmailLogPage], tags=["API - Emails"])
+def get_weekly_report_emails_api(response: Response, skip: int = 0, limit: int = 100, cursor: Optional[str] = None,
+                                 db: Session = Depends(get_db)):
     """Lists weekly report emails via API."""
-    return crud.get_email_logs_by_type(db, "weekly_report", skip=skip, limit=limit)
+    email_logs = crud.get_email_logs_by_type(db, "weekly_report", skip=skip, limit=limit, cursor=parse_cursor(cursor, EMAIL_CURSOR_KEYS))
+    return paginated(response, email_logs, limit, cursor, models.EmailLogPage, pagination.sent_at_key)
+
+# --- Notification Inbox ---
+
+@app.get("/api/notifications/", response_model=models.NotificationPage, tags=["API - Notifications"])
+def get_notifications_api(limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None,
+                          unread_only: bool = False, db: Session = Depends(get_db),
+                          patron=Depends(get_current_patron)):
+    """Lists the logged-in patron's notifications, newest first. Pass `next_cursor` back as `cursor` for the next page."""
+    notifications = crud.get_notifications_for_patron(
+        db, patron.id, only_unread=unread_only, limit=limit,
+        cursor=parse_cursor(cursor, ("created_at", "id")),
+    )
+    return models.NotificationPage(
+        items=notifications,
+        unread_count=crud.get_unread_notification_count(db, patron.id),
+        next_cursor=pagination.next_cursor(notifications, limit, pagination.created_at_key),
+    )
+
+@app.get("/api/notifications/unread-count", tags=["API - Notifications"])
+def get_unread_notification_count_api(db: Session = Depends(get_db), patron=Depends(get_current_patron)):
+    return {"unread_count": crud.get_unread_notification_count(db, patron.id)}
+
+@app.post("/api/notifications/read-all", tags=["API - Notifications"])
+def mark_all_notifications_read_api(db: Session = Depends(get_db), patron=Depends(get_current_patron)):
+    """Marks every notification of the logged-in patron as read."""
+    return {"updated": crud.mark_all_notifications_read(db, patron.id)}
+
+@app.delete("/api/notifications/read", tags=["API - Notifications"])
+def delete_read_notifications_api(db: Session = Depends(get_db), patron=Depends(get_current_patron)):
+    """Deletes every read notification of the logged-in patron."""
+    return {"deleted": crud.delete_read_notifications(db, patron.id)}
+
+@app.post("/api/notifications/{notification_id}/read", status_code=204, tags=["API - Notifications"])
+def mark_notification_read_api(notification_id: int, db: Session = Depends(get_db), patron=Depends(get_current_patron)):
+    if not crud.mark_notification_as_read(db, notification_id, patron_id=patron.id):
+        raise HTTPException(status_code=404, detail="Unread notification not found")
+    return
+
+@app.delete("/api/notifications/{notification_id}", status_code=204, tags=["API - Notifications"])
+def delete_notification_api(notification_id: int, db: Session = Depends(get_db), patron=Depends(get_current_patron)):
+    if not crud.delete_notification(db, notification_id, patron_id=patron.id):
+        raise HTTPException(status_code=404, detail="Notification not found")
+    return
+
+@app.get("/notifications/stream", tags=["Interface"])
+async def notification_stream(request: Request, access_token: str = Cookie(default=None)):
+    """
+    Server-Sent Events stream of the logged-in patron's new notifications.
+    The database session is only held while the cookie is resolved, not for the life of the stream.
+    """
+    async with get_async_sessionmaker()() as db:
+        patron = await get_cookie_patron_async(db, access_token)
+    if patron is None:
+        raise HTTPException(status_code=401, detail="Not logged in")
+    return StreamingResponse(
+        notification_bus.event_stream(patron.id, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/notifications/stream-stats", tags=["API - Notifications"])
+def notification_stream_stats_api():
+    """Shows the open notification streams and push counters of this worker."""
+    return notification_bus.hub.stats()
 
 @app.post("/notifications/read/{notification_id}", response_class=HTMLResponse)
 def mark_notification_read(notification_id: int, db: Session = Depends(get_db), request: Request = None):
@@ -495,15 +789,34 @@ def mark_notification_read(notification_id: int, db: Session = Depends(get_db),
 
 @app.post("/notifications/delete/{notification_id}", response_class=HTMLResponse)
 def delete_notification(notification_id: int, db: Session = Depends(get_db), request: Request = None):
-    notif = db.query(models.Notification).filter(models.Notification.id == notification_id).first()
-    if notif:
-        db.delete(notif)
-        db.commit()
+    crud.delete_notification(db, notification_id)
+    return RedirectResponse(url="/", status_code=303)
+
+@app.post("/notifications/read-all", response_class=HTMLResponse)
+def mark_all_notifications_read(db: Session = Depends(get_db), patron_id: int = Form(...)):
+    crud.mark_all_notifications_read(db, patron_id)
+    return RedirectResponse(url="/", status_code=303)
+
+@app.post("/notifications/delete-read", response_class=HTMLResponse)
+def delete_read_notifications(db: Session = Depends(get_db), patron_id: int = Form(...)):
+    crud.delete_read_notifications(db, patron_id)
     return RedirectResponse(url="/", status_code=303)
 
+@app.get("/admin/sql-profiles", response_class=HTMLResponse, tags=["Admin"])
+def admin_sql_profiles(request: Request, profile_id: Optional[int] = None):
+    """Shows the latest SQL profiles of this worker, or the statements of one profile."""
+    return templates.TemplateResponse("admin_sql_profiles.html", {
+        "request": request,
+        "enabled": sql_profiler.SQL_PROFILER_ENABLED,
+        "sample_rate": sql_profiler.SQL_PROFILER_SAMPLE_RATE,
+        "repeat_threshold": sql_profiler.SQL_PROFILER_REPEAT_THRESHOLD,
+        "profiles": list(sql_profiler.recent_profiles),
+        "selected": sql_profiler.get_profile(profile_id) if profile_id else None,
+    })
+
 @app.get("/admin/notifications", response_class=HTMLResponse, tags=["Admin"])
 def admin_notifications(request: Request, db: Session = Depends(get_db)):
-    notifications = db.query(models.Notification).order_by(models.Notification.created_at.desc()).all()
+    notifications = crud.get_notifications(db)
     patrons = crud.get_patrons(db)
     return templates.TemplateResponse("admin_notifications.html", {
         "request": request,
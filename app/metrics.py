@@ -0,0 +1,165 @@
+import contextvars
+import os
+import time
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from . import database
+
+# Prometheus metrics of the web app, the database and the Celery tasks.
+# With several worker processes (uvicorn --workers, gunicorn, Celery prefork) set
+# PROMETHEUS_MULTIPROC_DIR to an empty directory shared by the processes: each process
+# writes its values there and /metrics adds them up.
+PROMETHEUS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+HTTP_REQUESTS = Counter(
+    "http_requests_total", "HTTP requests by route template and status code", ["method", "route", "status"]
+)
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ["method", "route"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+HTTP_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "HTTP requests being served", multiprocess_mode="livesum"
+)
+
+DB_QUERIES = Counter("db_queries_total", "SQL statements executed")
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds", "SQL statement execution time",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request", "SQL statements executed per HTTP request", ["route"],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100),
+)
+DB_TIME_PER_REQUEST = Histogram(
+    "db_time_per_request_seconds", "Total SQL execution time per HTTP request", ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5),
+)
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time to get a connection from the pool", ["engine"],
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+DB_POOL_TIMEOUTS = Counter(
+    "db_pool_checkout_timeouts_total", "Pool checkouts that timed out waiting for a connection", ["engine"]
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections", "Connections in use", ["engine", "role"], multiprocess_mode="livesum"
+)
+DB_POOL_CAPACITY = Gauge(
+    "db_pool_capacity_connections", "Pool size plus overflow", ["engine", "role"], multiprocess_mode="livesum"
+)
+
+CELERY_TASK_RUNS = Counter("celery_task_runs_total", "Finished Celery tasks by outcome", ["task", "state"])
+CELERY_TASK_DURATION = Histogram(
+    "celery_task_duration_seconds", "Celery task run time", ["task"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900),
+)
+
+# --- Database ---
+
+# [statements, seconds] of the HTTP request being served; None outside requests
+_request_queries = contextvars.ContextVar("request_queries", default=None)
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_started = time.perf_counter()
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context.metrics_started
+    DB_QUERIES.inc()
+    DB_QUERY_DURATION.observe(elapsed)
+    queries = _request_queries.get()
+    if queries is not None:
+        queries[0] += 1
+        queries[1] += elapsed
+
+def _observe_checkout(name: str, seconds: float, timed_out: bool):
+    DB_POOL_CHECKOUT_WAIT.labels(name).observe(seconds)
+    if timed_out:
+        DB_POOL_TIMEOUTS.labels(name).inc()
+
+for _stats in database.pool_stats.values():
+    _stats.listeners.append(_observe_checkout)
+
+def update_pool_gauges():
+    """Copies the connection counts of this process's pools to the pool gauges."""
+    for name, pool in database.get_pools().items():
+        if isinstance(pool, QueuePool):
+            DB_POOL_CHECKED_OUT.labels(name, database.DB_ROLE).set(pool.checkedout())
+            DB_POOL_CAPACITY.labels(name, database.DB_ROLE).set(pool.size() + max(pool._max_overflow, 0))
+
+# --- HTTP ---
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, status and SQL statements of each request.
+    Requests are labelled with their route template (e.g. /api/books/{book_id}),
+    so label values stay bounded; paths that match no route share one label.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        queries = [0, 0.0]
+        token = _request_queries.set(queries)
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            _request_queries.reset(token)
+            route = scope.get("route")
+            route = getattr(route, "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+            HTTP_REQUESTS.labels(method, route, status_code).inc()
+            HTTP_REQUEST_DURATION.labels(method, route).observe(elapsed)
+            DB_QUERIES_PER_REQUEST.labels(route).observe(queries[0])
+            DB_TIME_PER_REQUEST.labels(route).observe(queries[1])
+            update_pool_gauges()
+
+# --- Celery ---
+
+def observe_task(task_name: str, state: str, seconds: float = None):
+    CELERY_TASK_RUNS.labels(task_name, state).inc()
+    if seconds is not None:
+        CELERY_TASK_DURATION.labels(task_name).observe(seconds)
+    update_pool_gauges()
+
+# --- Exposition ---
+
+def render_latest():
+    """Gets the metrics text and content type; in multiprocess mode the values of every process are added up."""
+    update_pool_gauges()
+    if PROMETHEUS_MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def mark_process_dead(pid: int = None):
+    """Drops the live gauges of an exited process from the multiprocess aggregation."""
+    if PROMETHEUS_MULTIPROC_DIR:
+        multiprocess.mark_process_dead(pid or os.getpid())
@@ -0,0 +1,30 @@
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+from .database import engine
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+# Revision matching the schema that Base.metadata.create_all used to build
+BASELINE_REVISION = "0001"
+
+def get_alembic_config() -> Config:
+    config = Config(str(BASE_DIR / "alembic.ini"))
+    config.set_main_option("script_location", str(BASE_DIR / "app" / "migrations"))
+    config.attributes["configure_logger"] = False
+    return config
+
+def upgrade_database(revision: str = "head"):
+    """Brings the database schema up to `revision`."""
+    config = get_alembic_config()
+    inspector = inspect(engine)
+    if inspector.has_table("books") and not inspector.has_table("alembic_version"):
+        # Database created by create_all before migrations existed
+        print(f"Existing schema found, stamping revision {BASELINE_REVISION}")
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, revision)
+    print("Database migrations applied successfully")
+
+if __name__ == "__main__":
+    upgrade_database()
@@ -0,0 +1,53 @@
+import re
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.database import engine
+from app import models
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = models.Base.metadata
+
+# Monthly archive partitions are created at runtime by app/retention.py
+ARCHIVE_PARTITION = re.compile(r"^(email_logs|notifications)_archive_\d{4}_\d{2}$")
+
+def include_name(name, type_, parent_names):
+    """
+    Keeps autogenerate away from tables not in the models: the SQLite FTS5 search tables
+    (raw SQL in 0005) and the monthly archive partitions.
+    """
+    if type_ == "table":
+        return not ((name or "").startswith("books_fts") or ARCHIVE_PARTITION.match(name or ""))
+    return True
+
+def run_migrations_offline():
+    """Emits the migration SQL without connecting (alembic upgrade --sql)."""
+    context.configure(
+        url=str(engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            render_as_batch=connection.dialect.name == "sqlite",
+            include_name=include_name,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,46 @@
+"""Report snapshot table for background weekly report jobs
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Deployments that ran create_all after report snapshots were added already have the table
+    if sa.inspect(op.get_bind()).has_table("report_snapshots"):
+        return
+    op.create_table(
+        "report_snapshots",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("job_id", sa.String(), nullable=False),
+        sa.Column("report_type", sa.String(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("week_start", sa.Date(), nullable=False),
+        sa.Column("data", sa.Text(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("completed_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_report_snapshots_id", "report_snapshots", ["id"])
+    op.create_index("ix_report_snapshots_job_id", "report_snapshots", ["job_id"], unique=True)
+    op.create_index("ix_report_snapshots_week_start", "report_snapshots", ["week_start"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("report_snapshots")
@@ -0,0 +1,51 @@
+"""Indexes for the overdue, borrowed-books, inbox and email log access paths
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+The indexes are built with CREATE INDEX CONCURRENTLY on PostgreSQL, outside the
+migration transaction, so the tables stay writable while they are built.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CHECKED_OUT = sa.text("patron_id IS NOT NULL")
+
+# (name, table, columns, extra create_index kwargs)
+INDEXES = [
+    # crud.get_overdue_books: due_date < today AND patron_id IS NOT NULL
+    ("ix_books_due_date_checked_out", "books", ["due_date"],
+     {"postgresql_where": CHECKED_OUT, "sqlite_where": CHECKED_OUT}),
+    # Borrowed books of one patron (main page, admin patron detail)
+    ("ix_books_patron_id", "books", ["patron_id"], {}),
+    # crud.get_notifications_for_patron: patron_id = ? ORDER BY created_at DESC
+    ("ix_notifications_patron_id_created_at", "notifications", ["patron_id", "created_at"], {}),
+    # crud.get_email_logs: ORDER BY sent_at DESC, id DESC
+    ("ix_email_logs_sent_at_id", "email_logs", ["sent_at", "id"], {}),
+    # crud.get_email_logs_by_type: email_type = ? ORDER BY sent_at DESC, id DESC
+    ("ix_email_logs_email_type_sent_at_id", "email_logs", ["email_type", "sent_at", "id"], {}),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, columns, kwargs in INDEXES:
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **kwargs)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
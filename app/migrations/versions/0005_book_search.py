@@ -0,0 +1,75 @@
+"""Search indexes over book titles and authors
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+
+PostgreSQL: a GIN full-text index (prefix and ranked matching) and trigram GIN
+indexes (fuzzy matching), built concurrently. The expressions must match the ones
+used in app/search.py. SQLite: an external-content FTS5 table kept in sync by triggers.
+These are dialect specific, so they are not declared on the models.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: Union[str, Sequence[str], None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BOOK_TSVECTOR = "to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(author, ''))"
+
+SQLITE_STATEMENTS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+        title, author, content='books', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ai AFTER INSERT ON books BEGIN
+        INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_ad AFTER DELETE ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS books_fts_au AFTER UPDATE OF title, author ON books BEGIN
+        INSERT INTO books_fts(books_fts, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+        INSERT INTO books_fts(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END
+    """,
+    "INSERT INTO books_fts(books_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        with op.get_context().autocommit_block():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_books_search_tsv ON books USING gin ({BOOK_TSVECTOR})")
+            op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_books_title_trgm ON books USING gin (title gin_trgm_ops)")
+            op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_books_author_trgm ON books USING gin (author gin_trgm_ops)")
+    elif dialect == "sqlite":
+        for statement in SQLITE_STATEMENTS:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "postgresql":
+        with op.get_context().autocommit_block():
+            for name in ("ix_books_author_trgm", "ix_books_title_trgm", "ix_books_search_tsv"):
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    elif dialect == "sqlite":
+        for trigger in ("books_fts_au", "books_fts_ad", "books_fts_ai"):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS books_fts")
@@ -0,0 +1,41 @@
+"""Denormalized unread notification counter on patrons
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 00:00:00
+
+The counter is backfilled from the existing notifications in one UPDATE.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, Sequence[str], None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "patrons",
+        sa.Column("unread_notifications", sa.Integer(), server_default="0", nullable=False),
+    )
+    patrons = sa.table("patrons", sa.column("id", sa.Integer), sa.column("unread_notifications", sa.Integer))
+    notifications = sa.table("notifications", sa.column("patron_id", sa.Integer), sa.column("is_read", sa.Boolean))
+    unread = (
+        sa.select(sa.func.count())
+        .where(notifications.c.patron_id == patrons.c.id, notifications.c.is_read == sa.false())
+        .scalar_subquery()
+    )
+    op.execute(patrons.update().values(unread_notifications=unread))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("patrons") as batch_op:
+        batch_op.drop_column("unread_notifications")
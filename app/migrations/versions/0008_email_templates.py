@@ -0,0 +1,60 @@
+"""Email templates; email logs store template parameters instead of full bodies
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 00:00:00
+
+Existing email logs keep their full message text and render as before.
+Template rows are created by the application on first use.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, Sequence[str], None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "email_templates",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("subject", sa.String(), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+    with op.batch_alter_table("email_logs") as batch_op:
+        batch_op.add_column(sa.Column("template_id", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("params", sa.Text(), nullable=True))
+        batch_op.alter_column("message", existing_type=sa.Text(), nullable=True)
+        batch_op.create_foreign_key(
+            "fk_email_logs_template_id_email_templates", "email_templates", ["template_id"], ["id"]
+        )
+    with op.batch_alter_table("email_logs_archive") as batch_op:
+        batch_op.add_column(sa.Column("template_id", sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column("params", sa.Text(), nullable=True))
+        batch_op.alter_column("message", existing_type=sa.Text(), nullable=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Templated rows have no stored body; downgrading requires them to be rendered or removed first
+    with op.batch_alter_table("email_logs_archive") as batch_op:
+        batch_op.alter_column("message", existing_type=sa.Text(), nullable=False)
+        batch_op.drop_column("params")
+        batch_op.drop_column("template_id")
+    with op.batch_alter_table("email_logs") as batch_op:
+        batch_op.drop_constraint("fk_email_logs_template_id_email_templates", type_="foreignkey")
+        batch_op.alter_column("message", existing_type=sa.Text(), nullable=False)
+        batch_op.drop_column("params")
+        batch_op.drop_column("template_id")
+    op.drop_table("email_templates")
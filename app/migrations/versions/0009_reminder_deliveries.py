@@ -0,0 +1,38 @@
+"""Reminder delivery records for idempotent overdue reminder chunks
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, Sequence[str], None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "reminder_deliveries",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("patron_id", sa.Integer(), nullable=False),
+        sa.Column("book_id", sa.Integer(), nullable=False),
+        sa.Column("reminder_date", sa.Date(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("patron_id", "book_id", "reminder_date", name="uq_reminder_deliveries_patron_book_date"),
+    )
+    op.create_index("ix_reminder_deliveries_reminder_date", "reminder_deliveries", ["reminder_date"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("reminder_deliveries")
@@ -0,0 +1,67 @@
+"""Per-loan reminder progress and the incremental reminder watermark
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17 00:00:00
+
+Current loans are backfilled with their first reminder day (due date + the first
+escalation interval). Columns are added without a table rebuild on SQLite, so
+the books_fts triggers stay in place.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, Sequence[str], None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PENDING_REMINDER = sa.text("next_reminder_on IS NOT NULL")
+# First escalation step of the default REMINDER_ESCALATION_DAYS (1,7,14) when this revision
+# was written. Fixed here so the migration does the same thing wherever and whenever it runs.
+FIRST_REMINDER_DAYS = 1
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("books", sa.Column("reminder_level", sa.Integer(), server_default="0", nullable=False))
+    op.add_column("books", sa.Column("last_reminded_on", sa.Date(), nullable=True))
+    op.add_column("books", sa.Column("next_reminder_on", sa.Date(), nullable=True))
+
+    if op.get_bind().dialect.name == "postgresql":
+        first_reminder = f"due_date + {FIRST_REMINDER_DAYS}"
+    else:
+        first_reminder = f"date(due_date, '+{FIRST_REMINDER_DAYS} days')"
+    op.execute(
+        f"UPDATE books SET next_reminder_on = {first_reminder} "
+        "WHERE patron_id IS NOT NULL AND due_date IS NOT NULL"
+    )
+
+    reminder_state = op.create_table(
+        "reminder_state",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("watermark", sa.Date(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.bulk_insert(reminder_state, [{"id": 1, "watermark": None}])
+
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_books_next_reminder_on", "books", ["next_reminder_on"],
+            postgresql_where=PENDING_REMINDER, sqlite_where=PENDING_REMINDER,
+            postgresql_concurrently=True, if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_books_next_reminder_on", table_name="books", postgresql_concurrently=True, if_exists=True)
+    op.drop_table("reminder_state")
+    op.drop_column("books", "next_reminder_on")
+    op.drop_column("books", "last_reminded_on")
+    op.drop_column("books", "reminder_level")
@@ -1,7 +1,7 @@
-from sqlalchemy import Boolean, Column, Integer, String, Date, ForeignKey, DateTime, Text
+from sqlalchemy import Boolean, Column, Integer, String, Date, ForeignKey, DateTime, Text, Index, UniqueConstraint, text
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Any, Dict, List
 from datetime import date, datetime
 from .database import Base
 
@@ -13,32 +13,82 @@ class Book(Base):
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
     author = Column(String, index=True)
-    patron_id = Column(Integer, ForeignKey("patrons.id"), nullable=True)
+    patron_id = Column(Integer, ForeignKey("patrons.id"), nullable=True, index=True)
     due_date = Column(Date, nullable=True)
+    # Overdue reminder progress of the current loan (reset on checkout and return)
+    reminder_level = Column(Integer, nullable=False, default=0, server_default="0")
+    last_reminded_on = Column(Date, nullable=True)
+    next_reminder_on = Column(Date, nullable=True)
 
     patron = relationship("Patron", back_populates="checked_out_books")
 
+    __table_args__ = (
+        # Overdue scans only look at checked out books
+        Index(
+            "ix_books_due_date_checked_out", "due_date",
+            postgresql_where=text("patron_id IS NOT NULL"),
+            sqlite_where=text("patron_id IS NOT NULL"),
+        ),
+        # Incremental reminder runs only look at loans with a pending reminder
+        Index(
+            "ix_books_next_reminder_on", "next_reminder_on",
+            postgresql_where=text("next_reminder_on IS NOT NULL"),
+            sqlite_where=text("next_reminder_on IS NOT NULL"),
+        ),
+    )
+
 class Patron(Base):
     __tablename__ = "patrons"
 
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
+    # Kept in step with the patron's unread notifications by the notification crud functions
+    unread_notifications = Column(Integer, nullable=False, default=0, server_default="0")
 
     checked_out_books = relationship("Book", back_populates="patron")
 
+class EmailTemplate(Base):
+    __tablename__ = "email_templates"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, nullable=False)  # Versioned, e.g. overdue_reminder_v1
+    subject = Column(String, nullable=False)
+    body = Column(Text, nullable=False)  # Jinja2 template
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class EmailLog(Base):
     __tablename__ = "email_logs"
 
     id = Column(Integer, primary_key=True, index=True)
     recipient_id = Column(Integer, ForeignKey("patrons.id"), nullable=False)
     subject = Column(String, nullable=False)
-    message = Column(Text, nullable=False)
+    # Full body of untemplated emails; templated emails keep only template_id and params
+    message_text = Column("message", Text, nullable=True)
+    template_id = Column(Integer, ForeignKey("email_templates.id"), nullable=True)
+    params = Column(Text, nullable=True)  # Template parameters as JSON
     sent_at = Column(DateTime, default=datetime.utcnow)
     status = Column(String, default="sent")  # sent, failed, pending
     email_type = Column(String, nullable=False)  # overdue_reminder, weekly_report, etc.
 
     recipient = relationship("Patron")
+    template = relationship("EmailTemplate", lazy="joined")
+
+    @property
+    def message(self) -> str:
+        """The email body, rendered from its template on demand."""
+        from .email_templates import render_log  # email_templates imports this module
+        return render_log(self.message_text, self.template.body if self.template else None, self.params)
+
+    @message.setter
+    def message(self, value: str):
+        self.message_text = value
+
+    __table_args__ = (
+        # Newest-first listings, overall and per email type
+        Index("ix_email_logs_sent_at_id", "sent_at", "id"),
+        Index("ix_email_logs_email_type_sent_at_id", "email_type", "sent_at", "id"),
+    )
 
 class Notification(Base):
     __tablename__ = "notifications"
@@ -51,6 +101,83 @@ class Notification(Base):
 
     patron = relationship("Patron")
 
+    __table_args__ = (
+        # Per-patron inbox, newest first
+        Index("ix_notifications_patron_id_created_at", "patron_id", "created_at"),
+        # Archival scans for rows older than the retention window
+        Index("ix_notifications_created_at", "created_at"),
+    )
+
+# Cold storage for rows moved out of the hot tables by the archival task (app/retention.py).
+# On PostgreSQL the archives are range partitioned by month, so old months can be dropped whole.
+
+class EmailLogArchive(Base):
+    __tablename__ = "email_logs_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    sent_at = Column(DateTime, primary_key=True)  # Partition key
+    recipient_id = Column(Integer, nullable=False)
+    subject = Column(String, nullable=False)
+    message = Column(Text, nullable=True)
+    template_id = Column(Integer, nullable=True)
+    params = Column(Text, nullable=True)
+    status = Column(String)
+    email_type = Column(String, nullable=False)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = ({"postgresql_partition_by": "RANGE (sent_at)"},)
+
+class NotificationArchive(Base):
+    __tablename__ = "notifications_archive"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    created_at = Column(DateTime, primary_key=True)  # Partition key
+    patron_id = Column(Integer, nullable=False)
+    message = Column(Text, nullable=False)
+    is_read = Column(Boolean)
+    archived_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = ({"postgresql_partition_by": "RANGE (created_at)"},)
+
+class ReminderDelivery(Base):
+    """One overdue reminder for a loan on a day; the unique key makes retried or duplicate runs skip it."""
+    __tablename__ = "reminder_deliveries"
+
+    id = Column(Integer, primary_key=True)
+    patron_id = Column(Integer, nullable=False)
+    book_id = Column(Integer, nullable=False)
+    reminder_date = Column(Date, nullable=False, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint("patron_id", "book_id", "reminder_date", name="uq_reminder_deliveries_patron_book_date"),
+    )
+
+class ReminderState(Base):
+    __tablename__ = "reminder_state"
+
+    id = Column(Integer, primary_key=True)  # Single row, id=1
+    watermark = Column(Date, nullable=True)  # Last day fully processed by an incremental reminder run
+
+class ReportSnapshot(Base):
+    __tablename__ = "report_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(String, unique=True, index=True, nullable=False)
+    report_type = Column(String, nullable=False, default="weekly")  # weekly, etc.
+    status = Column(String, nullable=False, default="pending")  # pending, running, completed, failed
+    week_start = Column(Date, index=True, nullable=False)
+    data = Column(Text, nullable=True)  # Report as JSON, set when completed
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    completed_at = Column(DateTime, nullable=True)
+
+class CatalogState(Base):
+    __tablename__ = "catalog_state"
+
+    id = Column(Integer, primary_key=True)  # Single row, id=1
+    version = Column(Integer, nullable=False, default=1)  # Bumped on every catalog or loan change
+
 # --- Pydantic API Modelleri ---
 
 class BookBase(BaseModel):
@@ -67,6 +194,31 @@ class BookResponse(BookBase):
     class Config:
         from_attributes = True
 
+class BookPage(BaseModel):
+    items: List[BookResponse]
+    next_cursor: Optional[str] = None
+
+class BookSearchResult(BookResponse):
+    rank: float
+
+class BookSearchPage(BaseModel):
+    items: List[BookSearchResult]
+    next_offset: Optional[int] = None
+
+class BookImportError(BaseModel):
+    row: int
+    error: str
+
+class BookImportSummary(BaseModel):
+    format: str
+    rows_read: int
+    imported: int
+    failed: int
+    errors: List[BookImportError]
+    errors_truncated: bool
+    elapsed_seconds: float
+    rows_per_second: float
+
 class PatronBase(BaseModel):
     username: str
 
@@ -81,6 +233,10 @@ class PatronResponse(PatronBase):
     class Config:
         from_attributes = True
 
+class PatronPage(BaseModel):
+    items: List[PatronResponse]
+    next_cursor: Optional[str] = None
+
 class EmailLogBase(BaseModel):
     recipient_id: int
     subject: str
@@ -97,6 +253,10 @@ class EmailLogResponse(EmailLogBase):
     class Config:
         from_attributes = True
 
+class EmailLogPage(BaseModel):
+    items: List[EmailLogResponse]
+    next_cursor: Optional[str] = None
+
 class NotificationBase(BaseModel):
     patron_id: int
     message: str
@@ -109,4 +269,18 @@ class NotificationResponse(NotificationBase):
     created_at: datetime
     is_read: bool
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class NotificationPage(BaseModel):
+    items: List[NotificationResponse]
+    unread_count: int
+    next_cursor: Optional[str] = None
+
+class ReportJobResponse(BaseModel):
+    job_id: str
+    status: str
+    week_start: date
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    error: Optional[str] = None
+    report: Optional[Dict[str, Any]] = None
@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+from datetime import datetime
+
+# When set, notifications are published to Redis and every web worker receives them;
+# otherwise an in-process broker is used (single worker, development and tests)
+NOTIFICATION_BUS_URL = os.getenv("NOTIFICATION_BUS_URL")
+# Seconds between keep-alive comments on idle event streams
+SSE_HEARTBEAT_SECONDS = int(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# Undelivered notifications buffered per connection; further ones are dropped
+SUBSCRIBER_QUEUE_SIZE = 100
+
+CHANNEL_PREFIX = "notifications:"
+
+def channel(patron_id: int) -> str:
+    return f"{CHANNEL_PREFIX}{patron_id}"
+
+def notification_payload(notification) -> dict:
+    """Gets the pushed fields of a Notification or of a bulk-inserted notification row."""
+    if isinstance(notification, dict):
+        get = notification.get
+    else:
+        get = lambda key: getattr(notification, key, None)
+    created_at = get("created_at")
+    return {
+        "id": get("id"),
+        "message": get("message"),
+        "created_at": created_at.isoformat() if isinstance(created_at, datetime) else created_at,
+    }
+
+class NotificationHub:
+    """
+    Fans published notifications out to the event streams connected to this process.
+    Every connection has its own asyncio queue. With Redis, the process shares one
+    pub/sub connection and subscribes to a patron's channel while the patron has a stream open.
+    """
+
+    def __init__(self, redis_url: str = None):
+        self.redis_url = redis_url
+        self._listeners = {}  # patron_id -> set of asyncio.Queue
+        self._loop = None
+        self._publisher = None
+        self._pubsub = None
+        self._reader = None
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        """False in processes where publishing could not reach any stream (in-process broker, no streams)."""
+        return bool(self.redis_url) or self._loop is not None
+
+    # --- Publishing (sync, from any thread or process) ---
+    def publish(self, patron_id: int, payload: dict):
+        self.publish_many([(patron_id, payload)])
+
+    def publish_many(self, messages):
+        """Publishes (patron_id, payload) pairs; with Redis they are sent in one pipeline."""
+        messages = [(patron_id, json.dumps(payload, default=str)) for patron_id, payload in messages]
+        if not messages:
+            return
+        self.published += len(messages)
+        if self.redis_url:
+            try:
+                pipe = self._get_publisher().pipeline(transaction=False)
+                for patron_id, data in messages:
+                    pipe.publish(channel(patron_id), data)
+                pipe.execute()
+            except Exception as e:
+                print(f"Notification publish error: {e}")
+                self.errors += 1
+            return
+        loop = self._loop
+        if loop is None:
+            return
+        try:
+            for patron_id, data in messages:
+                loop.call_soon_threadsafe(self._dispatch, patron_id, data)
+        except RuntimeError:
+            # The loop of the streams has been closed (e.g. the server is shutting down);
+            # nothing is listening, and the caller's commit must not fail over it
+            if self._loop is loop:
+                self._loop = None
+
+    def _get_publisher(self):
+        if self._publisher is None:
+            import redis
+            self._publisher = redis.Redis.from_url(self.redis_url)
+        return self._publisher
+
+    # --- Subscribing (async, in the web worker) ---
+    async def subscribe(self, patron_id: int) -> asyncio.Queue:
+        self._loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        listeners = self._listeners.setdefault(patron_id, set())
+        listeners.add(queue)
+        if self.redis_url and len(listeners) == 1:
+            await self._redis_subscribe(channel(patron_id))
+        return queue
+
+    async def unsubscribe(self, patron_id: int, queue: asyncio.Queue):
+        listeners = self._listeners.get(patron_id)
+        if listeners is None:
+            return
+        listeners.discard(queue)
+        if not listeners:
+            del self._listeners[patron_id]
+            if not self._listeners:
+                # Publishers skip the in-process broker until a stream subscribes again
+                self._loop = None
+            if self._pubsub is not None:
+                try:
+                    await self._pubsub.unsubscribe(channel(patron_id))
+                except Exception as e:
+                    print(f"Notification unsubscribe error: {e}")
+                    self.errors += 1
+
+    async def _redis_subscribe(self, name: str):
+        if self._pubsub is None:
+            import redis.asyncio as aioredis
+            self._pubsub = aioredis.Redis.from_url(self.redis_url).pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(name)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._read_redis())
+
+    async def _read_redis(self):
+        while True:
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # The pub/sub connection resubscribes its channels when it reconnects
+                print(f"Notification subscriber error: {e}")
+                self.errors += 1
+                await asyncio.sleep(1)
+                continue
+            if message is None or message.get("type") != "message":
+                continue
+            name = message["channel"].decode()
+            self._dispatch(int(name[len(CHANNEL_PREFIX):]), message["data"].decode())
+
+    def _dispatch(self, patron_id: int, data: str):
+        for queue in self._listeners.get(patron_id, ()):
+            try:
+                queue.put_nowait(data)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    async def close(self):
+        self._loop = None
+        if self._reader is not None:
+            self._reader.cancel()
+            self._reader = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis" if self.redis_url else "memory",
+            "patrons": len(self._listeners),
+            "connections": sum(len(listeners) for listeners in self._listeners.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+hub = NotificationHub(NOTIFICATION_BUS_URL)
+
+async def event_stream(patron_id: int, is_disconnected):
+    """Yields Server-Sent Events for a patron's new notifications, with keep-alive comments while idle."""
+    queue = await hub.subscribe(patron_id)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                data = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await is_disconnected():
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: notification\ndata: {data}\n\n"
+    finally:
+        await hub.unsubscribe(patron_id, queue)
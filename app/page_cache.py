@@ -0,0 +1,73 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+# Rendered catalog fragments kept per worker (one per catalog version)
+CATALOG_FRAGMENT_CACHE_SIZE = int(os.getenv("CATALOG_FRAGMENT_CACHE_SIZE", "4"))
+
+# Stands in for the viewer's patron id in the cached fragment; replaced on every request
+PATRON_ID_PLACEHOLDER = "__PATRON_ID__"
+
+class FragmentCache:
+    """Small LRU of rendered HTML fragments keyed by the data version they were rendered from."""
+
+    def __init__(self, max_size: int = CATALOG_FRAGMENT_CACHE_SIZE):
+        self.max_size = max_size
+        self._fragments = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            html = self._fragments.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._fragments.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def set(self, key, html: str):
+        with self._lock:
+            self._fragments[key] = html
+            self._fragments.move_to_end(key)
+            while len(self._fragments) > self.max_size:
+                self._fragments.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._fragments.clear()
+
+catalog_fragments = FragmentCache()
+
+def personalize_catalog(fragment: str, patron_id: int) -> str:
+    return fragment.replace(PATRON_ID_PLACEHOLDER, str(patron_id))
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+def state_etag(*state) -> str:
+    """ETag of the data a page is rendered from, so a 304 can be answered before rendering."""
+    return make_etag(repr(state).encode())
+
+_template_versions = {}
+
+def template_version(environment, *names) -> str:
+    """Hash of the sources of templates, so a changed template (e.g. a deploy) changes state ETags."""
+    version = _template_versions.get(names)
+    if version is None:
+        sources = [environment.loader.get_source(environment, name)[0] for name in names]
+        version = hashlib.sha1("\0".join(sources).encode()).hexdigest()[:12]
+        _template_versions[names] = version
+    return version
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Checks an If-None-Match header (possibly a list, possibly weak) against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
@@ -0,0 +1,60 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+def encode_cursor(values: dict) -> str:
+    """Encodes the sort key of the last row of a page into an opaque cursor token."""
+    raw = json.dumps(values, default=str, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _parse_id(value) -> int:
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise ValueError("Invalid cursor")
+    return int(value)
+
+def _parse_timestamp(value) -> datetime:
+    if not isinstance(value, str):
+        raise ValueError("Invalid cursor")
+    return datetime.fromisoformat(value)
+
+# Parsers of the cursor keys; they raise ValueError (or TypeError) for a value of the wrong type
+KEY_PARSERS = {
+    "id": _parse_id,
+    "sent_at": _parse_timestamp,
+    "created_at": _parse_timestamp,
+}
+
+def decode_cursor(token: str, keys=("id",)):
+    """
+    Decodes a cursor token into {key: parsed value} for `keys`.
+    Returns None for an empty token and raises ValueError for a malformed one.
+    """
+    if not token:
+        return None
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, dict) or any(key not in values for key in keys):
+        raise ValueError("Invalid cursor")
+    try:
+        return {key: KEY_PARSERS[key](values[key]) for key in keys}
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("Invalid cursor")
+
+def id_key(row):
+    return {"id": row.id}
+
+def sent_at_key(row):
+    return {"sent_at": row.sent_at.isoformat(), "id": row.id}
+
+def created_at_key(row):
+    return {"created_at": row.created_at.isoformat(), "id": row.id}
+
+def next_cursor(rows, limit: int, key_func=id_key):
+    """Gets the cursor of the page after `rows`, or None if this was the last page."""
+    if not rows or len(rows) < limit:
+        return None
+    return encode_cursor(key_func(rows[-1]))
@@ -0,0 +1,80 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+# bcrypt cost factor; raising it upgrades stored hashes on the next successful login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Processes used for hashing; 0 hashes in the calling thread (a threadpool thread for async callers)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+)
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify_and_update(password: str, hashed_password: str):
+    """Returns (valid, new_hash); new_hash is set when the stored hash uses outdated settings."""
+    return pwd_context.verify_and_update(password, hashed_password)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """Returns the password process pool of this process, creating it on first use."""
+    global _executor
+    if PASSWORD_HASH_WORKERS <= 0:
+        return None
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                # spawn: workers only need passlib, not the parent's DB connections or threads
+                _executor = ProcessPoolExecutor(
+                    max_workers=PASSWORD_HASH_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+def shutdown():
+    """Stops the password processes; queued hashes are cancelled, running ones finish first."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            # Without waiting, the process can exit before the workers get their stop
+            # sentinel, and they are left behind blocked on the call queue forever
+            _executor.shutdown(wait=True, cancel_futures=True)
+            _executor = None
+
+def hash_password(password: str) -> str:
+    executor = get_executor()
+    if executor is None:
+        return _hash(password)
+    return executor.submit(_hash, password).result()
+
+def verify_and_update(password: str, hashed_password: str):
+    executor = get_executor()
+    if executor is None:
+        return _verify_and_update(password, hashed_password)
+    return executor.submit(_verify_and_update, password, hashed_password).result()
+
+async def hash_password_async(password: str) -> str:
+    """Hashes on the process pool without blocking the event loop or a threadpool thread."""
+    executor = get_executor()
+    if executor is None:
+        return await run_in_threadpool(_hash, password)
+    return await asyncio.wrap_future(executor.submit(_hash, password))
+
+async def verify_and_update_async(password: str, hashed_password: str):
+    """Verifies on the process pool without blocking the event loop or a threadpool thread."""
+    executor = get_executor()
+    if executor is None:
+        return await run_in_threadpool(_verify_and_update, password, hashed_password)
+    return await asyncio.wrap_future(executor.submit(_verify_and_update, password, hashed_password))
@@ -0,0 +1,27 @@
+import os
+from datetime import date, timedelta
+
+# "full" reminds every overdue loan on every run; "incremental" only reminds loans
+# that reached their next escalation step, found through Book.next_reminder_on
+REMINDER_MODE = os.getenv("REMINDER_MODE", "full").lower()
+# Days overdue at which a loan is reminded in incremental mode
+ESCALATION_DAYS = sorted(int(days) for days in os.getenv("REMINDER_ESCALATION_DAYS", "1,7,14").split(",") if days.strip())
+
+def is_incremental() -> bool:
+    return REMINDER_MODE == "incremental"
+
+def first_reminder_on(due_date: date):
+    """The day a new loan gets its first overdue reminder."""
+    if due_date is None or not ESCALATION_DAYS:
+        return None
+    return due_date + timedelta(days=ESCALATION_DAYS[0])
+
+def advance(due_date: date, today: date):
+    """
+    Gets (reminder_level, next_reminder_on) for a loan reminded today.
+    Escalation steps that were missed (e.g. the job did not run) are skipped, not sent back to back.
+    """
+    level = sum(1 for days in ESCALATION_DAYS if due_date + timedelta(days=days) <= today)
+    if level >= len(ESCALATION_DAYS):
+        return level, None
+    return level, due_date + timedelta(days=ESCALATION_DAYS[level])
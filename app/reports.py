@@ -0,0 +1,97 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload
+from datetime import date, datetime, timedelta
+from . import models
+
+def _loan_filters(today: date, week_ago: date):
+    checked_out = models.Book.patron_id.isnot(None)
+    overdue = (checked_out, models.Book.due_date < today)
+    recent = (checked_out, models.Book.due_date >= week_ago)
+    return checked_out, overdue, recent
+
+def compute_weekly_report(db: Session, top_authors: int = 10):
+    """
+    Computes the weekly library statistics with aggregate queries.
+    Nothing is loaded per book, so the cost does not depend on Python-side list sizes.
+    """
+    today = date.today()
+    week_ago = today - timedelta(days=7)
+    checked_out, overdue, recent = _loan_filters(today, week_ago)
+    book_id = models.Book.id
+
+    # One pass over books for all headline numbers
+    totals = db.query(
+        func.count(book_id).label("total"),
+        func.count(book_id).filter(checked_out).label("checked_out"),
+        func.count(book_id).filter(*overdue).label("overdue"),
+        func.count(book_id).filter(*recent).label("recent"),
+    ).one()
+
+    # Per-author breakdown, largest collections first
+    author_rows = db.query(
+        models.Book.author,
+        func.count(book_id).label("total"),
+        func.count(book_id).filter(checked_out).label("checked_out"),
+        func.count(book_id).filter(*overdue).label("overdue"),
+    ).group_by(models.Book.author).order_by(
+        func.count(book_id).desc(), models.Book.author
+    ).limit(top_authors).all()
+
+    total_books = totals.total or 0
+    checked_out_books = totals.checked_out or 0
+    return {
+        "total_books": total_books,
+        "checked_out_books": checked_out_books,
+        "overdue_books": totals.overdue or 0,
+        "available_books": total_books - checked_out_books,
+        "checkout_rate": f"{(checked_out_books / total_books * 100):.1f}%" if total_books else "0%",
+        "recent_checkouts": totals.recent or 0,
+        "top_authors": [
+            {
+                "author": row.author,
+                "total": row.total,
+                "checked_out": row.checked_out,
+                "overdue": row.overdue,
+            }
+            for row in author_rows
+        ],
+        "generated_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+def get_report_book_lists(db: Session, limit: int = 50):
+    """Gets the overdue and recently checked out books shown on the report page, capped at `limit` each."""
+    today = date.today()
+    week_ago = today - timedelta(days=7)
+    _, overdue, recent = _loan_filters(today, week_ago)
+    base = db.query(models.Book).options(joinedload(models.Book.patron))
+    overdue_books = base.filter(*overdue).order_by(models.Book.due_date, models.Book.id).limit(limit).all()
+    recent_checkouts = base.filter(*recent).order_by(models.Book.due_date.desc(), models.Book.id).limit(limit).all()
+    return overdue_books, recent_checkouts
+
+def _serialize_books(books):
+    return [
+        {
+            "id": book.id,
+            "title": book.title,
+            "author": book.author,
+            "due_date": book.due_date.isoformat() if book.due_date else None,
+            "patron": {"username": book.patron.username} if book.patron else None,
+        }
+        for book in books
+    ]
+
+def build_report_snapshot(db: Session):
+    """Builds the full JSON-serializable weekly report stored in a snapshot."""
+    report_data = compute_weekly_report(db)
+    overdue_books, recent_checkouts = get_report_book_lists(db)
+    report_data["overdue_books_list"] = _serialize_books(overdue_books)
+    report_data["recent_checkouts_list"] = _serialize_books(recent_checkouts)
+    return report_data
+
+TREND_KEYS = ("total_books", "checked_out_books", "overdue_books", "available_books", "recent_checkouts")
+
+def report_trend(current: dict, previous: dict):
+    """Gets the change of each headline number against an earlier report."""
+    if not current or not previous:
+        return {}
+    return {key: current.get(key, 0) - previous.get(key, 0) for key in TREND_KEYS}
@@ -0,0 +1,129 @@
+import os
+import re
+from datetime import date, datetime, timedelta
+from sqlalchemy import DateTime, delete, func, insert, literal, select, text
+from sqlalchemy.orm import Session
+from . import crud, models
+
+# Rows older than this many days are moved from the hot tables to the archive tables
+EMAIL_LOG_RETENTION_DAYS = int(os.getenv("EMAIL_LOG_RETENTION_DAYS", "90"))
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "90"))
+# Rows moved per transaction
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "5000"))
+# Archived months kept before they are purged; 0 keeps the archive forever
+ARCHIVE_RETENTION_MONTHS = int(os.getenv("ARCHIVE_RETENTION_MONTHS", "0"))
+
+# hot table -> (hot model, archive model, timestamp column, retention days)
+ARCHIVES = {
+    "email_logs": (models.EmailLog, models.EmailLogArchive, "sent_at", EMAIL_LOG_RETENTION_DAYS),
+    "notifications": (models.Notification, models.NotificationArchive, "created_at", NOTIFICATION_RETENTION_DAYS),
+}
+
+PARTITION_SUFFIX = re.compile(r"_(\d{4})_(\d{2})$")
+
+def _month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def partition_name(archive_table: str, month: date) -> str:
+    return f"{archive_table}_{month:%Y_%m}"
+
+def _is_postgresql(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+def ensure_monthly_partitions(db: Session, archive_table: str, first: datetime, last: datetime, known: set = None):
+    """Creates the monthly partitions of an archive table covering first..last (PostgreSQL only)."""
+    month = _month_start(first)
+    while month <= _month_start(last):
+        name = partition_name(archive_table, month)
+        if known is None or name not in known:
+            db.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {archive_table} "
+                f"FOR VALUES FROM ('{month}') TO ('{_next_month(month)}')"
+            ))
+            if known is not None:
+                known.add(name)
+        month = _next_month(month)
+
+def archive_batch(db: Session, table: str, cutoff: datetime, batch_size: int = ARCHIVE_BATCH_SIZE,
+                  partitions: set = None) -> int:
+    """
+    Moves up to batch_size rows older than cutoff from a hot table to its archive in one transaction.
+    Returns the number of rows moved.
+    """
+    model, archive, ts_name, _ = ARCHIVES[table]
+    ts = getattr(model, ts_name)
+    postgresql = _is_postgresql(db)
+    query = select(model.id, ts).where(ts < cutoff).limit(batch_size)
+    if postgresql:
+        # Concurrent archival runs take disjoint batches
+        query = query.with_for_update(skip_locked=True)
+    rows = db.execute(query).all()
+    if not rows:
+        return 0
+    ids = [row[0] for row in rows]
+    if postgresql:
+        stamps = [row[1] for row in rows]
+        ensure_monthly_partitions(db, archive.__tablename__, min(stamps), max(stamps), partitions)
+
+    columns = [column.name for column in archive.__table__.columns if column.name != "archived_at"]
+    db.execute(insert(archive).from_select(
+        columns + ["archived_at"],
+        select(*[model.__table__.c[name] for name in columns], literal(datetime.utcnow(), DateTime))
+        .where(model.id.in_(ids)),
+    ))
+    if model is models.Notification:
+        unread = db.execute(
+            select(model.patron_id, func.count())
+            .where(model.id.in_(ids), model.is_read == False)
+            .group_by(model.patron_id)
+        ).all()
+        crud.adjust_unread_counts(db, {patron_id: -count for patron_id, count in unread})
+    db.execute(delete(model).where(model.id.in_(ids)).execution_options(synchronize_session=False))
+    db.commit()
+    return len(ids)
+
+def archive_old_rows(db: Session, table: str, retention_days: int = None, batch_size: int = ARCHIVE_BATCH_SIZE) -> int:
+    """Moves every row older than the retention window of a hot table to its archive, batch by batch."""
+    if retention_days is None:
+        retention_days = ARCHIVES[table][3]
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    partitions = set()
+    moved = 0
+    while True:
+        count = archive_batch(db, table, cutoff, batch_size, partitions)
+        moved += count
+        if count < batch_size:
+            return moved
+
+def purge_archive(db: Session, table: str, months: int = ARCHIVE_RETENTION_MONTHS) -> int:
+    """
+    Removes archived rows of months older than the archive retention.
+    On PostgreSQL whole monthly partitions are dropped; returns the number of partitions or rows removed.
+    """
+    if months <= 0:
+        return 0
+    _, archive, ts_name, _ = ARCHIVES[table]
+    oldest_kept = _month_start(date.today())
+    for _ in range(months):
+        oldest_kept = date(oldest_kept.year - (oldest_kept.month == 1), (oldest_kept.month - 2) % 12 + 1, 1)
+    if not _is_postgresql(db):
+        result = db.execute(delete(archive).where(getattr(archive, ts_name) < oldest_kept))
+        db.commit()
+        return result.rowcount
+    names = db.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :parent"
+    ), {"parent": archive.__tablename__}).scalars().all()
+    dropped = 0
+    for name in names:
+        match = PARTITION_SUFFIX.search(name)
+        if match and date(int(match.group(1)), int(match.group(2)), 1) < oldest_kept:
+            db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped += 1
+    db.commit()
+    return dropped
@@ -0,0 +1,88 @@
+import re
+from sqlalchemy import Float, Integer, func, literal_column, or_, text
+from sqlalchemy.orm import Session
+from . import models
+
+SEARCH_MODES = ("fulltext", "prefix", "fuzzy")
+
+# Minimum trigram similarity for fuzzy matches (PostgreSQL pg_trgm)
+FUZZY_THRESHOLD = 0.3
+
+def _terms(q: str):
+    return re.findall(r"\w+", q or "")
+
+def book_tsvector():
+    """Full-text document of a book; must match the ix_books_search_tsv index expression."""
+    return func.to_tsvector(
+        literal_column("'simple'"),
+        func.coalesce(models.Book.title, literal_column("''"))
+        + literal_column("' '")
+        + func.coalesce(models.Book.author, literal_column("''")),
+    )
+
+def _availability_filter(query, available):
+    if available is True:
+        return query.filter(models.Book.patron_id.is_(None))
+    if available is False:
+        return query.filter(models.Book.patron_id.isnot(None))
+    return query
+
+def _search_postgresql(db: Session, q: str, mode: str):
+    Book = models.Book
+    if mode == "fuzzy":
+        score = func.greatest(func.similarity(Book.title, q), func.similarity(Book.author, q))
+        db.execute(text("SELECT set_limit(:threshold)"), {"threshold": FUZZY_THRESHOLD})
+        return db.query(Book, score.label("rank")).filter(
+            or_(Book.title.op("%")(q), Book.author.op("%")(q))
+        ), score
+    if mode == "prefix":
+        tsquery = func.to_tsquery(literal_column("'simple'"), " & ".join(f"{term}:*" for term in _terms(q)))
+    else:
+        tsquery = func.websearch_to_tsquery(literal_column("'simple'"), q)
+    vector = book_tsvector()
+    score = func.ts_rank_cd(vector, tsquery)
+    return db.query(Book, score.label("rank")).filter(vector.op("@@")(tsquery)), score
+
+def _fts5_query(q: str, prefix: bool) -> str:
+    quoted = ['"' + term.replace('"', '""') + '"' + ("*" if prefix else "") for term in _terms(q)]
+    return " ".join(quoted)
+
+def _search_sqlite(db: Session, q: str, mode: str):
+    # FTS5 has no similarity search; fuzzy falls back to prefix matching of every term
+    match = _fts5_query(q, prefix=mode in ("prefix", "fuzzy"))
+    fts = text("SELECT rowid AS book_id, bm25(books_fts) AS score FROM books_fts WHERE books_fts MATCH :match") \
+        .bindparams(match=match).columns(book_id=Integer, score=Float).subquery("fts")
+    # bm25 is lower for better matches; negate it so higher rank is better everywhere
+    score = -fts.c.score
+    return db.query(models.Book, score.label("rank")).join(fts, fts.c.book_id == models.Book.id), score
+
+def _search_like(db: Session, q: str):
+    Book = models.Book
+    pattern = f"%{q}%"
+    return db.query(Book, literal_column("0.0").label("rank")).filter(
+        or_(Book.title.ilike(pattern), Book.author.ilike(pattern))
+    ), None
+
+def search_books(db: Session, q: str, mode: str = "fulltext", available: bool = None,
+                 limit: int = 20, offset: int = 0):
+    """
+    Searches book titles and authors, best matches first.
+    Returns a list of (book, rank) pairs.
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unsupported search mode: {mode}")
+    if not _terms(q):
+        return []
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        query, score = _search_postgresql(db, q, mode)
+    elif dialect == "sqlite":
+        query, score = _search_sqlite(db, q, mode)
+    else:
+        query, score = _search_like(db, q)
+    query = _availability_filter(query, available)
+    if score is not None:
+        query = query.order_by(score.desc(), models.Book.id)
+    else:
+        query = query.order_by(models.Book.id)
+    return query.offset(offset).limit(limit).all()
@@ -0,0 +1,61 @@
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from . import mailer
+from .smtp_stand_in import SMTPStandIn
+
+# Compares email throughput with a new SMTP connection per message (connect, send, quit)
+# against the pooled sender, both against the in-process SMTP stand-in. --latency adds a
+# delay before every server reply to stand in for the network round trip to a real server.
+
+def _messages(count: int):
+    return [(f"reader{i}@example.com", f"Benchmark {i}", f"Message {i}") for i in range(count)]
+
+def measure_per_message(server: SMTPStandIn, messages, threads: int) -> float:
+    """Messages per second when every message opens and closes its own connection."""
+    def send(message):
+        to_email, subject, body = message
+        conn = server.connect()
+        try:
+            conn.sendmail(mailer.SMTP_USERNAME, to_email, mailer.build_message(to_email, subject, body))
+        finally:
+            conn.quit()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(send, messages))
+    return len(messages) / (time.perf_counter() - started)
+
+def measure_pooled(server: SMTPStandIn, messages, size: int, batch_size: int) -> float:
+    """Messages per second through SMTPConnectionPool.deliver."""
+    pool = mailer.SMTPConnectionPool(server.connect, size=size)
+    started = time.perf_counter()
+    results = pool.deliver(messages, batch_size=batch_size)
+    elapsed = time.perf_counter() - started
+    pool.close()
+    if not all(results):
+        raise RuntimeError(f"{results.count(False)} of {len(results)} messages failed")
+    return len(messages) / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare pooled and per-message SMTP delivery.")
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.002, help="Seconds before each server reply")
+    parser.add_argument("--pool-size", type=int, default=mailer.SMTP_POOL_SIZE,
+                        help="Pool connections; also the threads of the per-message run")
+    parser.add_argument("--batch-size", type=int, default=mailer.SMTP_BATCH_SIZE)
+    args = parser.parse_args()
+
+    messages = _messages(args.messages)
+    with SMTPStandIn(latency=args.latency) as server:
+        per_message = measure_per_message(server, messages, args.pool_size)
+        connections = server.connections
+        pooled = measure_pooled(server, messages, args.pool_size, args.batch_size)
+        pooled_connections = server.connections - connections
+    print(f"{args.messages} messages, {args.latency * 1000:.1f} ms per reply, {args.pool_size} threads")
+    print(f"per-message connections: {per_message:.0f} msgs/s ({connections} connections)")
+    print(f"pooled connections:      {pooled:.0f} msgs/s ({pooled_connections} connections)")
+    print(f"speed-up: {pooled / per_message:.1f}x")
+
+if __name__ == "__main__":
+    main()
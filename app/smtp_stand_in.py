@@ -0,0 +1,112 @@
+import socketserver
+import threading
+import time
+
+# A minimal in-process SMTP server for the mailer tests and `python -m app.smtp_benchmark`.
+# It speaks just enough SMTP for smtplib (no TLS, no AUTH), records what it receives and
+# can reject recipients, drop connections and add a delay before each reply.
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        if self.server.stand_in.latency:
+            time.sleep(self.server.stand_in.latency)
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        stand_in = self.server.stand_in
+        stand_in._count("connections")
+        accepted = 0
+        mail_from, recipients = None, []
+        self.reply("220 stand-in ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command[:4].upper()
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 stand-in")
+            elif verb == "MAIL":
+                mail_from, recipients = command[10:].strip("<>"), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = command[8:].strip("<>")
+                if address in stand_in.rejected:
+                    self.reply("550 No such user")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in self.rfile:
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    data.append(data_line)
+                with stand_in._lock:
+                    stand_in.messages.append((mail_from, recipients, b"".join(data)))
+                self.reply("250 OK queued")
+                accepted += 1
+                if stand_in.messages_per_connection and accepted >= stand_in.messages_per_connection:
+                    # Hang up without a word, as servers with per-connection message limits do
+                    return
+            elif verb in ("RSET", "NOOP"):
+                mail_from, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class SMTPStandIn:
+    """
+    Local SMTP server on a free port, used as a context manager.
+    `rejected` recipients get a 550, `messages_per_connection` closes a connection after that
+    many messages, and `latency` seconds are slept before each reply.
+    """
+
+    def __init__(self, rejected=(), messages_per_connection: int = 0, latency: float = 0.0):
+        self.rejected = set(rejected)
+        self.messages_per_connection = messages_per_connection
+        self.latency = latency
+        self.messages = []  # (mail_from, recipients, data)
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def _count(self, name: str):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def connect(self):
+        """Opens an smtplib connection to the stand-in; a connection_factory for SMTPConnectionPool."""
+        import smtplib
+        host, port = self.address
+        return smtplib.SMTP(host, port, timeout=10)
+
+    def start(self):
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.stand_in = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,184 @@
+import contextvars
+import itertools
+import os
+import random
+import re
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Opt-in profiler of the SQL statements run by each request, for finding which crud call or
+# lazy load makes a page slow. Sampled requests get an X-SQL-Profile header and a log line,
+# and the latest profiles are listed at /admin/sql-profiles.
+SQL_PROFILER_ENABLED = os.getenv("SQL_PROFILER_ENABLED", "false").lower() == "true"
+# Share of requests profiled, e.g. 0.01 in production
+SQL_PROFILER_SAMPLE_RATE = float(os.getenv("SQL_PROFILER_SAMPLE_RATE", "1.0"))
+# A statement fingerprint run this many times in one request is reported as a likely N+1
+SQL_PROFILER_REPEAT_THRESHOLD = int(os.getenv("SQL_PROFILER_REPEAT_THRESHOLD", "5"))
+# Profiles kept per worker for the admin page
+SQL_PROFILER_HISTORY = int(os.getenv("SQL_PROFILER_HISTORY", "100"))
+# Statements listed per profile; further ones are still counted
+MAX_STATEMENTS = 200
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+_PROFILER_FILES = {__file__, str(Path(__file__).with_name("metrics.py"))}
+
+# --- Fingerprints ---
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|%s|\$\d+|(?<![:\w]):\w+|\?")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROWS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_SPACES = re.compile(r"\s+")
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement: str) -> str:
+    """
+    Normalizes a statement so that runs differing only in literals, parameters or the
+    length of IN / VALUES lists get the same fingerprint.
+    """
+    statement = _COMMENTS.sub(" ", statement)
+    statement = _STRINGS.sub("?", statement)
+    statement = _PLACEHOLDERS.sub("?", statement)
+    statement = _NUMBERS.sub("?", statement)
+    statement = _LISTS.sub("(...)", statement)
+    statement = _ROWS.sub("(...)", statement)
+    return _SPACES.sub(" ", statement).strip()
+
+def _caller() -> str:
+    """Gets the innermost project frame (module or template) that ran the current statement."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if filename.startswith(str(BASE_DIR)) and "site-packages" not in filename and filename not in _PROFILER_FILES:
+            path = os.path.relpath(filename, BASE_DIR)
+            if filename.endswith(".py"):
+                return f"{path}:{frame.f_lineno} in {frame.f_code.co_name}"
+            return path
+        frame = frame.f_back
+    return "?"
+
+# --- Profiles ---
+
+_ids = itertools.count(1)
+
+class RequestProfile:
+    """The SQL statements of one request, grouped by fingerprint."""
+
+    def __init__(self, method: str, path: str):
+        self.id = next(_ids)
+        self.method = method
+        self.path = path
+        self.route = None
+        self.status = None
+        self.started_at = datetime.utcnow()
+        self.duration_ms = 0.0
+        self.count = 0
+        self.sql_ms = 0.0
+        self.statements = []  # (fingerprint, ms), in execution order
+        self.fingerprints = {}  # fingerprint -> [count, ms, first caller]
+
+    def record(self, statement: str, seconds: float):
+        ms = seconds * 1000
+        key = fingerprint(statement)
+        self.count += 1
+        self.sql_ms += ms
+        if len(self.statements) < MAX_STATEMENTS:
+            self.statements.append((key, ms))
+        stats = self.fingerprints.get(key)
+        if stats is None:
+            self.fingerprints[key] = [1, ms, _caller()]
+        else:
+            stats[0] += 1
+            stats[1] += ms
+
+    @property
+    def repeated(self):
+        """(fingerprint, count, ms, caller) of the statements run at least SQL_PROFILER_REPEAT_THRESHOLD times."""
+        return sorted(
+            ((key, count, ms, caller) for key, (count, ms, caller) in self.fingerprints.items()
+             if count >= SQL_PROFILER_REPEAT_THRESHOLD),
+            key=lambda item: -item[1],
+        )
+
+    @property
+    def by_fingerprint(self):
+        """(fingerprint, count, ms, caller), slowest first."""
+        return sorted(
+            ((key, count, ms, caller) for key, (count, ms, caller) in self.fingerprints.items()),
+            key=lambda item: -item[2],
+        )
+
+    def header_value(self) -> str:
+        return f"statements={self.count}; sql_ms={self.sql_ms:.1f}; distinct={len(self.fingerprints)}; repeated={len(self.repeated)}"
+
+    def log_line(self) -> str:
+        line = (
+            f"SQL profile #{self.id} {self.method} {self.path} -> {self.status}: {self.count} statements "
+            f"({len(self.fingerprints)} distinct) in {self.sql_ms:.1f} ms of {self.duration_ms:.1f} ms"
+        )
+        for key, count, ms, caller in self.repeated:
+            line += f"\n  N+1? {count}x {ms:.1f} ms at {caller}: {key[:200]}"
+        return line
+
+recent_profiles = deque(maxlen=SQL_PROFILER_HISTORY)
+
+def get_profile(profile_id: int):
+    return next((profile for profile in list(recent_profiles) if profile.id == profile_id), None)
+
+_current_profile = contextvars.ContextVar("sql_profile", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile.get() is not None:
+        context.profiler_started = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile.get()
+    started = getattr(context, "profiler_started", None)
+    if profile is not None and started is not None:
+        profile.record(statement, time.perf_counter() - started)
+
+class SqlProfilerMiddleware:
+    """ASGI middleware profiling the SQL statements of a sample of requests."""
+
+    def __init__(self, app, sample_rate: float = SQL_PROFILER_SAMPLE_RATE):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile(scope["method"], scope["path"])
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"x-sql-profile", profile.header_value().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.duration_ms = (time.perf_counter() - started) * 1000
+            _current_profile.reset(token)
+            profile.route = getattr(scope.get("route"), "path", None)
+            recent_profiles.appendleft(profile)
+            print(profile.log_line())
+
+def install(app):
+    """Hooks the engine events and adds the profiling middleware to app."""
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    app.add_middleware(SqlProfilerMiddleware)
@@ -0,0 +1,43 @@
+import argparse
+import statistics
+import subprocess
+import sys
+from .benchmark import BASE_DIR, run_server
+
+# Measures the cold start of the web app in fresh processes: the import time of app.main
+# and the time from launching uvicorn to the first successful response.
+# Run `python -m app.bootstrap` first, so the measured runs do not include migrations.
+
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import app.main; print(time.perf_counter() - started)"
+
+def measure_import() -> float:
+    """Seconds to import app.main in a new interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BASE_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+def measure_first_response(path: str = "/health", timeout: float = 60.0) -> float:
+    """Seconds from starting a uvicorn process to its first 200 response for path."""
+    with run_server(path=path, timeout=timeout) as (base_url, seconds):
+        return seconds
+
+def _summary(samples) -> str:
+    return (
+        f"min {min(samples) * 1000:.0f} ms, median {statistics.median(samples) * 1000:.0f} ms, "
+        f"max {max(samples) * 1000:.0f} ms"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cold start of the web app.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/health", help="Path requested as the first response")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    print(f"import app.main: {_summary(imports)}")
+    first_responses = [measure_first_response(args.path) for _ in range(args.runs)]
+    print(f"cold start to first response ({args.path}): {_summary(first_responses)}")
+
+if __name__ == "__main__":
+    main()
@@ -1,135 +1,339 @@
 from .celery_config import celery_app
-from . import crud, models
-from .database import SessionLocal
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+from . import crud, email_templates, metrics, mailer, notification_bus, reminder_schedule, reports, retention
+from .database import SessionLocal, engine
 import os
-from datetime import date, datetime
+import time
+import uuid
+from celery import chord, group
+from celery.signals import task_postrun, task_prerun, worker_process_init, worker_process_shutdown
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from sqlalchemy.exc import OperationalError
 
-# Email settings (in real project, should be loaded from .env)
-SMTP_SERVER = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
-SMTP_USERNAME = os.getenv("SMTP_USERNAME", "your-email@gmail.com")
-SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "your-app-password")
+# Set to "true" to actually deliver reminder emails through the SMTP pool
+SMTP_ENABLED = os.getenv("SMTP_ENABLED", "false").lower() == "true"
+EMAIL_RECIPIENT_DOMAIN = os.getenv("EMAIL_RECIPIENT_DOMAIN", "example.com")
+
+# Number of patrons whose reminder rows are buffered before each bulk insert
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "1000"))
+# Patrons per chunk task of the overdue reminder fan-out
+REMINDER_CHUNK_SIZE = int(os.getenv("REMINDER_CHUNK_SIZE", "500"))
+REMINDER_CHUNK_RETRIES = int(os.getenv("REMINDER_CHUNK_RETRIES", "3"))
+# Days of reminder delivery records kept for duplicate detection
+REMINDER_DELIVERY_RETENTION_DAYS = int(os.getenv("REMINDER_DELIVERY_RETENTION_DAYS", "30"))
+
+@worker_process_init.connect
+def reset_database_pool(**kwargs):
+    """Drops the connections inherited from the parent, so forked pool processes never share one."""
+    engine.dispose(close=False)
+
+@worker_process_shutdown.connect
+def mark_metrics_process_dead(**kwargs):
+    metrics.mark_process_dead()
+
+# task id -> perf_counter() at start, for the task duration metric
+_task_started = {}
+
+@task_prerun.connect
+def record_task_start(task_id=None, **kwargs):
+    _task_started[task_id] = time.perf_counter()
+
+@task_postrun.connect
+def record_task_end(task_id=None, task=None, state=None, **kwargs):
+    started = _task_started.pop(task_id, None)
+    metrics.observe_task(task.name, state or "UNKNOWN", time.perf_counter() - started if started else None)
 
 def send_email(to_email: str, subject: str, message: str) -> bool:
-    """Sends email and returns success status."""
+    """Sends email over a pooled SMTP connection and returns success status."""
     try:
-        # Create email message
-        msg = MIMEMultipart()
-        msg['From'] = SMTP_USERNAME
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        
-        # Add message body
-        msg.attach(MIMEText(message, 'plain'))
-        
-        # Connect to SMTP server and send email
-        server = smtplib.SMTP(SMTP_SERVER, SMTP_PORT)
-        server.starttls()
-        server.login(SMTP_USERNAME, SMTP_PASSWORD)
-        text = msg.as_string()
-        server.sendmail(SMTP_USERNAME, to_email, text)
-        server.quit()
-        
-        return True
+        return mailer.get_pool().send_batch([(to_email, subject, message)])[0]
     except Exception as e:
         print(f"Email sending error: {e}")
         return False
 
+def build_overdue_digest(patron, books):
+    """Builds the email template parameters and notification text for one patron's overdue books."""
+    params = {
+        "username": patron.username,
+        "books": [[book.title, book.author, book.due_date.isoformat()] for book in books],
+    }
+    # Notification message (with fine example)
+    fine_amount = 10 * len(books)  # Example fine amount, per overdue book
+    if len(books) == 1:
+        notif_msg = f"The book '{books[0].title}' is overdue! Please return it immediately. Your fine is ${fine_amount}."
+    else:
+        titles = ", ".join(f"'{book.title}'" for book in books)
+        notif_msg = f"{len(books)} books are overdue: {titles}. Please return them immediately. Your fine is ${fine_amount}."
+    return params, notif_msg
+
+def _flush_reminder_rows(db, email_rows, notif_rows, pushed):
+    """
+    Writes pending reminder rows in one executemany per table, inside the open transaction.
+    Notifications to push after commit are collected in `pushed` when the notification bus is enabled.
+    """
+    crud.bulk_create_email_logs(db, email_rows, return_defaults=SMTP_ENABLED)
+    push = notification_bus.hub.enabled
+    crud.bulk_create_notifications(db, notif_rows, return_defaults=push)
+    if push:
+        pushed.extend((row["patron_id"], notification_bus.notification_payload(row)) for row in notif_rows)
+    written = len(email_rows) + len(notif_rows)
+    email_rows.clear()
+    notif_rows.clear()
+    return written
+
+def _deliver_outbox(db, outbox):
+    """Sends committed pending emails through the SMTP pool and records each result on its EmailLog."""
+    results = mailer.get_pool().deliver(
+        (to_email, row["subject"], message) for row, to_email, message in outbox
+    )
+    statuses = []
+    for (row, to_email, _), email_sent in zip(outbox, results):
+        statuses.append({"id": row["id"], "status": "sent" if email_sent else "failed"})
+        if not email_sent:
+            print(f"FAILED TO SEND: {to_email}")
+    crud.bulk_update_email_log_status(db, statuses)
+    db.commit()
+    sent_count = sum(1 for email_sent in results if email_sent)
+    return sent_count, len(results) - sent_count
+
+def plan_reminder_chunks(db, chunk_size: int = REMINDER_CHUNK_SIZE, incremental: bool = False, today: date = None):
+    """Splits the patrons with overdue books into inclusive patron id ranges of up to chunk_size patrons."""
+    chunks = []
+    first_patron_id = None
+    count = 0
+    for patron_id in crud.iter_overdue_patron_ids(db, incremental=incremental, today=today):
+        if first_patron_id is None:
+            first_patron_id = patron_id
+        count += 1
+        if count == chunk_size:
+            chunks.append((first_patron_id, patron_id))
+            first_patron_id = None
+            count = 0
+    if first_patron_id is not None:
+        chunks.append((first_patron_id, patron_id))
+    return chunks
+
+def send_reminders_for_range(db, first_patron_id: int, last_patron_id: int, reminder_date: date,
+                             incremental: bool = False):
+    """
+    Sends one digest email and notification per patron with overdue books in a patron id range.
+    Loans are selected as of reminder_date, the day the chunk was planned for, so a retry
+    after midnight sends the same reminders. Each (patron, book) is claimed for the day before
+    its reminder is written, in the same transaction, so a retried or duplicate run only sends
+    what has not been sent yet.
+    In incremental mode only loans with a reminder due are read, and each reminded loan
+    moves to its next escalation step.
+    """
+    started = time.perf_counter()
+    stats = {"overdue_books": 0, "already_sent": 0, "sent": 0, "failed": 0, "rows_written": 0}
+    email_rows = []
+    notif_rows = []
+    outbox = []
+    pushed = []
+    pending = []
+    reminded = []
+    now = datetime.utcnow()
+    template_id = email_templates.get_template_id(db, email_templates.OVERDUE_REMINDER)
+    subject, body = email_templates.TEMPLATES[email_templates.OVERDUE_REMINDER]
+
+    def write_pending():
+        claimed = crud.claim_reminder_deliveries(
+            db, [(patron.id, book.id) for patron, books in pending for book in books], reminder_date
+        )
+        for patron, books in pending:
+            new_books = [book for book in books if (patron.id, book.id) in claimed]
+            stats["already_sent"] += len(books) - len(new_books)
+            if not new_books:
+                continue
+            if incremental:
+                reminded.extend(new_books)
+            params, notif_msg = build_overdue_digest(patron, new_books)
+            email_row = {
+                "recipient_id": patron.id,
+                "subject": subject,
+                "template_id": template_id,
+                "params": email_templates.dump_params(params),
+                "email_type": "overdue_reminder",
+                "status": "pending" if SMTP_ENABLED else "sent",
+                "sent_at": now,
+            }
+            email_rows.append(email_row)
+            if SMTP_ENABLED:
+                # Delivered after commit; in real project, use patron.email
+                outbox.append((
+                    email_row,
+                    f"{patron.username}@{EMAIL_RECIPIENT_DOMAIN}",
+                    email_templates.render(body, params),
+                ))
+            else:
+                stats["sent"] += 1
+            notif_rows.append({
+                "patron_id": patron.id,
+                "message": notif_msg,
+                "created_at": now,
+                "is_read": False,
+            })
+        pending.clear()
+        crud.mark_books_reminded(db, reminded, reminder_date)
+        reminded.clear()
+        stats["rows_written"] += _flush_reminder_rows(db, email_rows, notif_rows, pushed)
+
+    overdue_books = crud.iter_overdue_books_by_patron(
+        db, batch_size=REMINDER_BATCH_SIZE, first_patron_id=first_patron_id, last_patron_id=last_patron_id,
+        incremental=incremental, today=reminder_date,
+    )
+    for patron_id, patron_books in groupby(overdue_books, key=lambda book: book.patron_id):
+        books = list(patron_books)
+        stats["overdue_books"] += len(books)
+        if not books[0].patron:
+            continue
+        pending.append((books[0].patron, books))
+        if len(pending) >= REMINDER_BATCH_SIZE:
+            write_pending()
+    write_pending()
+    db.commit()
+    notification_bus.hub.publish_many(pushed)
+
+    if outbox:
+        stats["sent"], stats["failed"] = _deliver_outbox(db, outbox)
+    elapsed = time.perf_counter() - started
+    stats["elapsed_seconds"] = round(elapsed, 3)
+    stats["rows_per_second"] = round(stats["rows_written"] / elapsed, 1) if elapsed > 0 else 0.0
+    return stats
+
 @celery_app.task
 def send_overdue_reminders():
-    """Sends email reminders and notifications for overdue books."""
+    """
+    Plans the day's overdue reminders and fans them out as a chord: one chunk task per
+    patron id range, spread over the workers, followed by a summary of all chunks.
+    With REMINDER_MODE=incremental only loans that reached their next escalation step are planned.
+    """
     print("Checking for overdue books...")
-    
+
+    today = date.today()
+    day = today.isoformat()
+    incremental = reminder_schedule.is_incremental()
     db = SessionLocal()
     try:
-        overdue_books = crud.get_overdue_books(db)
-        
-        if not overdue_books:
-            print("No overdue books found.")
-            return
-        
-        sent_count = 0
-        failed_count = 0
-        
-        for book in overdue_books:
-            if book.patron:
-                # Email template
-                subject = "Overdue Book Reminder"
-                message = f"""
-Dear {book.patron.username},
-
-This is a reminder that the following book is overdue:
-
-Book: {book.title} by {book.author}
-Due Date: {book.due_date}
-
-Please return this book as soon as possible to avoid any late fees.
-
-Thank you,
-Library Management System
-                """.strip()
-                # Notification message (with fine example)
-                fine_amount = 10  # Example fine amount
-                notif_msg = f"The book '{book.title}' is overdue! Please return it immediately. Your fine is ${fine_amount}."
-                # Send email (in real project, use patron.email)
-                email_sent = True  # send_email(f"{book.patron.username}@example.com", subject, message)
-                # Create email log record
-                email_log = models.EmailLogCreate(
-                    recipient_id=book.patron.id,
-                    subject=subject,
-                    message=message,
-                    email_type="overdue_reminder"
-                )
-                if email_sent:
-                    crud.create_email_log(db, email_log)
-                    sent_count += 1
-                    print(f"REMINDER SENT: {book.patron.username} - '{book.title}' (Due: {book.due_date})")
-                else:
-                    failed_count += 1
-                    print(f"FAILED TO SEND: {book.patron.username} - '{book.title}'")
-                # Create notification record
-                notif = models.NotificationCreate(
-                    patron_id=book.patron.id,
-                    message=notif_msg
-                )
-                crud.create_notification(db, notif)
-        print(f"Overdue reminder task completed. Sent: {sent_count}, Failed: {failed_count}")
+        if incremental:
+            watermark = crud.get_reminder_watermark(db)
+            if watermark is not None and watermark >= today:
+                print(f"Incremental reminders already processed up to {watermark}.")
+                return
+        chunks = plan_reminder_chunks(db, incremental=incremental, today=today)
+        if not chunks and incremental:
+            crud.set_reminder_watermark(db, today)
+    finally:
+        db.close()
+    if not chunks:
+        print("No overdue books found.")
+        return
+    print(f"Dispatching {len(chunks)} overdue reminder chunks for {day}" + (" (incremental)" if incremental else ""))
+    header = group(send_overdue_reminder_chunk.s(first, last, day, incremental) for first, last in chunks)
+    result = chord(header)(summarize_overdue_reminders.s(day, incremental, time.time()))
+    return {"day": day, "chunks": len(chunks), "incremental": incremental, "summary_task_id": result.id}
+
+@celery_app.task(bind=True, acks_late=True, autoretry_for=(OperationalError,),
+                 retry_backoff=True, max_retries=REMINDER_CHUNK_RETRIES)
+def send_overdue_reminder_chunk(self, first_patron_id: int, last_patron_id: int, day: str, incremental: bool = False):
+    """Sends the reminders of one patron id range. Safe to retry: already sent loans are skipped."""
+    key = f"overdue:{day}:{first_patron_id}-{last_patron_id}"
+    db = SessionLocal()
+    try:
+        stats = send_reminders_for_range(db, first_patron_id, last_patron_id, date.fromisoformat(day), incremental)
+    except Exception:
+        db.rollback()
+        raise
     finally:
         db.close()
+    print(
+        f"Reminder chunk {key}: Books: {stats['overdue_books']}, Sent: {stats['sent']}, "
+        f"Failed: {stats['failed']}, Already sent: {stats['already_sent']}"
+    )
+    print(f"Wrote {stats['rows_written']} rows in {stats['elapsed_seconds']:.2f}s ({stats['rows_per_second']:.0f} rows/s)")
+    return {"key": key, **stats}
 
 @celery_app.task
-def generate_weekly_report():
-    """Generates weekly borrowing statistics."""
+def summarize_overdue_reminders(results, day: str, incremental: bool = False, dispatched_at: float = None):
+    """
+    Chord callback: adds up the results of all reminder chunks of a day and advances the incremental watermark.
+    The overall rate is rows written per second of wall-clock time since dispatch (dispatched_at,
+    a time.time() value), so it reflects the chunks running in parallel.
+    """
+    summary = {"day": day, "chunks": len(results)}
+    for field in ("overdue_books", "sent", "failed", "already_sent", "rows_written"):
+        summary[field] = sum(result.get(field, 0) for result in results)
+    summary["slowest_chunk_seconds"] = max((result.get("elapsed_seconds", 0) for result in results), default=0)
+    # Without a dispatch time, fall back to the slowest chunk
+    elapsed = time.time() - dispatched_at if dispatched_at else summary["slowest_chunk_seconds"]
+    summary["elapsed_seconds"] = round(elapsed, 3)
+    summary["rows_per_second"] = round(summary["rows_written"] / elapsed, 1) if elapsed > 0 else 0.0
+    if incremental:
+        db = SessionLocal()
+        try:
+            crud.set_reminder_watermark(db, date.fromisoformat(day))
+        finally:
+            db.close()
+    print(
+        f"Overdue reminder task completed. Books: {summary['overdue_books']}, Sent: {summary['sent']}, "
+        f"Failed: {summary['failed']}, Already sent: {summary['already_sent']} ({summary['chunks']} chunks)"
+    )
+    print(f"Wrote {summary['rows_written']} rows in {summary['elapsed_seconds']:.2f}s ({summary['rows_per_second']:.0f} rows/s)")
+    return summary
+
+@celery_app.task
+def generate_weekly_report(job_id: str = None):
+    """Generates weekly borrowing statistics and stores them as a report snapshot."""
     print("Generating weekly report...")
     
     db = SessionLocal()
     try:
-        # Calculate weekly statistics
-        all_books = crud.get_books(db)
-        checked_out_books = [book for book in all_books if book.patron_id is not None]
-        overdue_books = crud.get_overdue_books(db)
-        
-        report_data = {
-            "total_books": len(all_books),
-            "checked_out_books": len(checked_out_books),
-            "overdue_books": len(overdue_books),
-            "available_books": len(all_books) - len(checked_out_books),
-            "checkout_rate": f"{(len(checked_out_books) / len(all_books) * 100):.1f}%" if all_books else "0%",
-            "generated_at": datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        }
+        snapshot = crud.get_report_snapshot_by_job(db, job_id) if job_id else None
+        if snapshot is None:
+            # Scheduled or direct runs have no snapshot created by the admin panel yet
+            snapshot = crud.create_report_snapshot(db, job_id or uuid.uuid4().hex)
+        crud.update_report_snapshot_status(db, snapshot, "running")
+        try:
+            report_data = reports.build_report_snapshot(db)
+        except Exception as e:
+            db.rollback()
+            crud.update_report_snapshot_status(db, snapshot, "failed", error=str(e))
+            raise
+        crud.update_report_snapshot_status(db, snapshot, "completed", data=report_data)
         
-        print(f"Weekly report generated successfully at {report_data['generated_at']}")
-        print(f"Report data: {report_data}")
+        print(f"Weekly report generated successfully at {report_data['generated_at']} (job {snapshot.job_id})")
         
-        # Return report data (will be used in admin panel)
-        return report_data
+        return {"job_id": snapshot.job_id, "status": snapshot.status}
             
     finally:
         db.close()
 
+@celery_app.task
+def archive_old_records():
+    """Moves email logs and notifications older than their retention window to the archive tables."""
+    print("Archiving old email logs and notifications...")
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        result = {}
+        for table in retention.ARCHIVES:
+            moved = retention.archive_old_rows(db, table)
+            purged = retention.purge_archive(db, table)
+            result[table] = {"archived": moved, "purged": purged}
+            print(f"{table}: archived {moved} rows, purged {purged} from the archive")
+        cutoff = date.today() - timedelta(days=REMINDER_DELIVERY_RETENTION_DAYS)
+        result["reminder_deliveries"] = {"deleted": crud.delete_reminder_deliveries_before(db, cutoff)}
+        elapsed = time.perf_counter() - started
+        print(f"Archival completed in {elapsed:.2f}s")
+        result["elapsed_seconds"] = round(elapsed, 3)
+        return result
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
 @celery_app.task
 def send_test_email():
     """Sends a test email."""
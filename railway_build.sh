@@ -9,27 +9,7 @@ echo "Using port: $PORT"
 
 # Initialize database
 echo "Initializing database..."
-python -c "
-import os
-from app.database import engine
-from app.models import Base
-from app.db_seeder import seed_db
-from app.database import SessionLocal
-
-try:
-    print('Creating database tables...')
-    Base.metadata.create_all(bind=engine)
-    print('Database tables created successfully')
-    
-    print('Seeding database...')
-    db = SessionLocal()
-    seed_db(db)
-    print('Database seeded successfully')
-    db.close()
-except Exception as e:
-    print(f'Database initialization error: {e}')
-    # Don't exit, continue with application startup
-"
+python -m app.bootstrap || echo "Database initialization failed, starting anyway"
 
 # Start the application
 echo "Starting application..."
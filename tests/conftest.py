@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+# The app reads its configuration at import, so point it at a throwaway SQLite database first
+_db_dir = tempfile.mkdtemp(prefix="library-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/test.db"
+os.environ["DB_ROLE"] = "web"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ.pop("NOTIFICATION_BUS_URL", None)
+os.environ.pop("PATRON_CACHE_REDIS_URL", None)
+
+import pytest
+
+@pytest.fixture(scope="session")
+def database():
+    """Migrates and seeds the test database once per run."""
+    from app.bootstrap import migrate, seed
+    migrate()
+    seed()
+
+@pytest.fixture
+def db(database):
+    from app.database import SessionLocal
+    session = SessionLocal()
+    yield session
+    session.close()
+
+@pytest.fixture
+def client(database):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def patron_headers(db):
+    """Authorization header of the seeded patron."""
+    from app import main, models
+    patron = db.query(models.Patron).filter(models.Patron.username == "ahmet").one()
+    return {"Authorization": f"Bearer {main.create_access_token({'sub': patron.username})}"}
@@ -0,0 +1,79 @@
+import asyncio
+import pytest
+from app import async_crud, crud, models
+from app.database import get_async_engine, get_async_sessionmaker
+
+# app/async_crud.py copies the crud queries used by the async endpoints; these tests run the
+# same loan cycle through both so the two copies cannot drift apart silently.
+
+LOAN_FIELDS = ("patron_id", "due_date", "reminder_level", "last_reminded_on", "next_reminder_on")
+
+def loan_state(book):
+    return None if book is None else {field: getattr(book, field) for field in LOAN_FIELDS}
+
+def sync_cycle(db, book_id: int, patron_id: int):
+    steps = []
+    for action in ("checkout", "checkout", "return", "return"):
+        version = crud.get_catalog_version(db)
+        if action == "checkout":
+            book = crud.checkout_book(db, book_id, patron_id)
+        else:
+            book = crud.return_book(db, book_id)
+        state = loan_state(book)
+        db.expire_all()
+        steps.append((action, state, crud.get_catalog_version(db) - version))
+    return steps
+
+def async_cycle(book_id: int, patron_id: int):
+    async def run():
+        steps = []
+        try:
+            async with get_async_sessionmaker()() as db:
+                for action in ("checkout", "checkout", "return", "return"):
+                    version = await async_crud.get_catalog_version(db)
+                    if action == "checkout":
+                        book = await async_crud.checkout_book(db, book_id, patron_id)
+                    else:
+                        book = await async_crud.return_book(db, book_id)
+                    state = loan_state(book)
+                    db.expire_all()
+                    steps.append((action, state, await async_crud.get_catalog_version(db) - version))
+        finally:
+            # Pooled aiosqlite connections belong to this event loop
+            await get_async_engine().dispose()
+        return steps
+
+    return asyncio.run(run())
+
+@pytest.fixture
+def two_books(db):
+    return [crud.create_book(db, models.BookCreate(title=f"Parity Book {i}", author="Tester")).id for i in range(2)]
+
+def test_sync_and_async_loan_cycles_match(db, two_books):
+    patron = db.query(models.Patron).filter(models.Patron.username == "ahmet").one()
+    sync_steps = sync_cycle(db, two_books[0], patron.id)
+    async_steps = async_cycle(two_books[1], patron.id)
+    assert async_steps == sync_steps
+    # A checkout, a refused checkout, a return and a refused return; only successes bump the catalog
+    assert [(action, state is not None, bumped) for action, state, bumped in sync_steps] == [
+        ("checkout", True, 1), ("checkout", False, 0), ("return", True, 1), ("return", False, 0),
+    ]
+
+def test_sync_and_async_notification_reads_match(db):
+    patron = db.query(models.Patron).filter(models.Patron.username == "ahmet").one()
+    for message in ("parity one", "parity two", "parity three"):
+        crud.create_notification(db, models.NotificationCreate(patron_id=patron.id, message=message))
+    expected = (
+        [n.id for n in crud.get_notifications_for_patron(db, patron.id, only_unread=True, limit=2)],
+        crud.get_unread_notification_count(db, patron.id),
+    )
+
+    async def run():
+        try:
+            async with get_async_sessionmaker()() as adb:
+                notifications = await async_crud.get_notifications_for_patron(adb, patron.id, only_unread=True, limit=2)
+                return [n.id for n in notifications], await async_crud.get_unread_notification_count(adb, patron.id)
+        finally:
+            await get_async_engine().dispose()
+
+    assert asyncio.run(run()) == expected
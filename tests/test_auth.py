@@ -0,0 +1,64 @@
+import asyncio
+import threading
+import pytest
+from app import passwords
+
+@pytest.fixture(params=[0, 1], ids=["inline", "process-pool"])
+def hash_workers(request, monkeypatch):
+    """Runs a test with hashing inline and on a one-process password pool."""
+    passwords.shutdown()
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_WORKERS", request.param)
+    yield
+    passwords.shutdown()
+
+def login(client, username, password):
+    return client.post("/api/auth/login", data={"username": username, "password": password})
+
+def test_register_api_hashes_password(client, hash_workers):
+    username = f"reader{passwords.PASSWORD_HASH_WORKERS}"
+    response = client.post("/api/auth/register", json={"username": username, "password": "secret-1"})
+    assert response.status_code == 200
+    assert login(client, username, "secret-1").status_code == 200
+    assert client.post("/api/auth/register", json={"username": username, "password": "x"}).status_code == 400
+
+def test_register_form_creates_patron(client, hash_workers):
+    username = f"formreader{passwords.PASSWORD_HASH_WORKERS}"
+    response = client.post("/register", data={"username": username, "password": "secret-2"}, follow_redirects=False)
+    assert response.status_code == 303
+    assert login(client, username, "secret-2").status_code == 200
+
+def test_update_patron_rehashes_password(client, hash_workers):
+    username = f"updater{passwords.PASSWORD_HASH_WORKERS}"
+    patron_id = client.post("/api/auth/register", json={"username": username, "password": "old"}).json()["id"]
+    response = client.put(f"/api/patrons/{patron_id}", json={"username": f"{username}-new", "password": "new"})
+    assert response.status_code == 200
+    assert login(client, f"{username}-new", "new").status_code == 200
+    assert login(client, f"{username}-new", "old").status_code == 400
+
+def test_inline_hashing_runs_off_the_event_loop(monkeypatch):
+    passwords.shutdown()
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_WORKERS", 0)
+    threads = []
+    hash_ = passwords._hash
+    verify_and_update = passwords._verify_and_update
+
+    def recording_hash(password):
+        threads.append(threading.get_ident())
+        return hash_(password)
+
+    def recording_verify_and_update(password, hashed_password):
+        threads.append(threading.get_ident())
+        return verify_and_update(password, hashed_password)
+
+    monkeypatch.setattr(passwords, "_hash", recording_hash)
+    monkeypatch.setattr(passwords, "_verify_and_update", recording_verify_and_update)
+
+    async def hash_and_verify():
+        hashed = await passwords.hash_password_async("secret-3")
+        valid, _ = await passwords.verify_and_update_async("secret-3", hashed)
+        return valid, threading.get_ident()
+
+    valid, loop_thread = asyncio.run(hash_and_verify())
+    assert valid
+    assert len(threads) == 2
+    assert loop_thread not in threads
@@ -0,0 +1,45 @@
+import asyncio
+import pytest
+from app.auth_cache import CachedPatron, PatronCache
+
+fakeredis = pytest.importorskip("fakeredis")
+
+class BlockingClient:
+    """Stands in for the sync Redis client; async code paths must not touch it."""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"sync Redis client used from async code: {name}")
+
+def test_async_methods_use_async_redis_client():
+    cache = PatronCache(redis_client=BlockingClient(), async_redis_client=fakeredis.FakeAsyncRedis())
+
+    async def scenario():
+        assert await cache.get_async("ayse") is None
+        await cache.set_async("ayse", CachedPatron(id=3, username="ayse"))
+        assert await cache.get_async("ayse") == CachedPatron(id=3, username="ayse")
+        await cache.invalidate_async("ayse")
+        assert await cache.get_async("ayse") is None
+
+    asyncio.run(scenario())
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+
+def test_sync_and_async_clients_share_entries():
+    server = fakeredis.FakeServer()
+    cache = PatronCache(
+        redis_client=fakeredis.FakeRedis(server=server),
+        async_redis_client=fakeredis.FakeAsyncRedis(server=server),
+    )
+    cache.set("mehmet", CachedPatron(id=4, username="mehmet"))
+    assert asyncio.run(cache.get_async("mehmet")) == CachedPatron(id=4, username="mehmet")
+
+def test_async_methods_fall_back_to_local_cache():
+    cache = PatronCache()
+    asyncio.run(cache.set_async("zeynep", CachedPatron(id=5, username="zeynep")))
+    assert cache.get("zeynep") == CachedPatron(id=5, username="zeynep")
+
+def test_main_page_resolves_cookie_patron(client, patron_headers):
+    client.cookies.set("access_token", patron_headers["Authorization"])
+    response = client.get("/")
+    client.cookies.clear()
+    assert response.status_code == 200
+    assert "ahmet" in response.text
@@ -0,0 +1,18 @@
+from app import bootstrap, db_init
+
+def test_init_database_delegates_to_the_bootstrap_steps(monkeypatch):
+    calls = []
+
+    def step():
+        calls.append("all")
+
+    monkeypatch.setitem(bootstrap.STEPS, "all", [step])
+    assert db_init.init_database() == 0
+    assert calls == ["all"]
+
+def test_init_database_reports_a_failed_step(monkeypatch):
+    def migrate():
+        raise RuntimeError("no database")
+
+    monkeypatch.setitem(bootstrap.STEPS, "all", [migrate])
+    assert db_init.init_database() == 1
@@ -0,0 +1,33 @@
+import io
+import pytest
+from app import catalog_import, models
+
+def catalog_csv(titles, tail: bytes = b"") -> bytes:
+    lines = ["title,author"] + [f"{title},Importer" for title in titles]
+    return ("\n".join(lines) + "\n").encode("utf-8") + tail
+
+def count_books(db, prefix: str) -> int:
+    return db.query(models.Book).filter(models.Book.title.like(f"{prefix}%")).count()
+
+def test_import_of_utf8_csv(client, db):
+    data = catalog_csv(["Import Ok 1", "Import Ok 2"])
+    response = client.post("/api/books/import", files={"file": ("books.csv", data, "text/csv")})
+    assert response.status_code == 200
+    assert response.json()["imported"] == 2
+    assert count_books(db, "Import Ok") == 2
+
+def test_non_utf8_upload_is_rejected_with_400(client, db):
+    data = catalog_csv(["Import Latin1 1"], "Caf\xe9 Book,Importer\n".encode("latin-1"))
+    response = client.post("/api/books/import", files={"file": ("books.csv", data, "text/csv")})
+    assert response.status_code == 400
+    assert "UTF-8" in response.json()["detail"]
+    assert count_books(db, "Import Latin1") == 0
+
+def test_non_utf8_rows_after_inserted_batches_roll_back_the_import(db):
+    # Enough rows that several batches are inserted before the decoder reaches the bad bytes
+    titles = [f"Import Rollback {i}" for i in range(2000)]
+    stream = io.BytesIO(catalog_csv(titles, b"\xff\xfe broken,Importer\n"))
+    with pytest.raises(catalog_import.InvalidEncodingError):
+        catalog_import.import_books(db, stream, "csv", batch_size=100)
+    assert count_books(db, "Import Rollback") == 0
+    assert not stream.closed
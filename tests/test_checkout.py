@@ -0,0 +1,25 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app import crud, models
+
+WORKERS = 8
+
+def test_concurrent_checkouts_of_one_book_let_exactly_one_succeed(client, db):
+    book = crud.create_book(db, models.BookCreate(title="Contended Book", author="Tester"))
+    patron_ids = [patron.id for patron in crud.get_patrons(db)]
+    start = threading.Barrier(WORKERS)
+
+    def checkout(worker: int) -> int:
+        start.wait()
+        response = client.post(
+            f"/api/books/{book.id}/checkout", data={"patron_id": patron_ids[worker % len(patron_ids)]}
+        )
+        return response.status_code
+
+    with ThreadPoolExecutor(max_workers=WORKERS) as executor:
+        statuses = list(executor.map(checkout, range(WORKERS)))
+
+    assert sorted(statuses) == [200] + [400] * (WORKERS - 1)
+    db.expire_all()
+    assert crud.get_book(db, book.id).patron_id is not None
+    crud.return_book(db, book.id)
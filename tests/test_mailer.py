@@ -0,0 +1,46 @@
+from app import mailer
+from app.smtp_stand_in import SMTPStandIn
+
+def messages(count: int, to_email: str = "reader@example.com"):
+    return [(to_email, f"Subject {i}", f"Body {i}") for i in range(count)]
+
+def test_batches_reuse_one_pooled_connection():
+    with SMTPStandIn() as server:
+        pool = mailer.SMTPConnectionPool(server.connect, size=1)
+        assert pool.send_batch(messages(5)) == [True] * 5
+        assert pool.send_batch(messages(5)) == [True] * 5
+        pool.close()
+    assert len(server.messages) == 10
+    assert server.connections == 1
+    assert pool.opened == 1
+    assert pool.reconnects == 0
+
+def test_dropped_connection_is_reopened_and_the_message_retried():
+    with SMTPStandIn(messages_per_connection=2) as server:
+        pool = mailer.SMTPConnectionPool(server.connect, size=1)
+        assert pool.send_batch(messages(5)) == [True] * 5
+        pool.close()
+    assert [data.count(b"Subject: Subject") for _, _, data in server.messages] == [1] * 5
+    assert server.connections == 3
+    assert pool.reconnects == 2
+
+def test_rejected_recipient_fails_only_its_message():
+    batch = messages(1) + messages(1, "nobody@example.com") + messages(1)
+    with SMTPStandIn(rejected={"nobody@example.com"}) as server:
+        pool = mailer.SMTPConnectionPool(server.connect, size=1)
+        assert pool.send_batch(batch) == [True, False, True]
+        pool.close()
+    assert [recipients for _, recipients, _ in server.messages] == [["reader@example.com"]] * 2
+    assert server.connections == 1
+    assert pool.reconnects == 0
+
+def test_deliver_spreads_batches_over_the_pool():
+    batch = messages(10)
+    batch[4] = ("nobody@example.com", "Subject 4", "Body 4")
+    with SMTPStandIn(rejected={"nobody@example.com"}) as server:
+        pool = mailer.SMTPConnectionPool(server.connect, size=2)
+        results = pool.deliver(batch, batch_size=3)
+        pool.close()
+    assert results == [True] * 4 + [False] + [True] * 5
+    assert len(server.messages) == 9
+    assert server.connections <= 2
@@ -0,0 +1,87 @@
+import asyncio
+import json
+from app import crud, main, models, notification_bus
+
+async def open_stream(app, cookie: str):
+    """
+    Calls the ASGI app for GET /notifications/stream and returns (body chunk queue,
+    disconnect event, app task). TestClient buffers whole responses, so it cannot read an open stream.
+    """
+    chunks = asyncio.Queue()
+    disconnect = asyncio.Event()
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/notifications/stream", "raw_path": b"/notifications/stream",
+        "query_string": b"", "root_path": "", "client": ("testclient", 50000), "server": ("testserver", 80),
+        "headers": [(b"host", b"testserver"), (b"cookie", f'access_token="{cookie}"'.encode())],
+    }
+    request_sent = False
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            await chunks.put(("status", message["status"]))
+        elif message["type"] == "http.response.body" and message.get("body"):
+            await chunks.put(("body", message["body"].decode()))
+
+    task = asyncio.create_task(app(scope, receive, send))
+    return chunks, disconnect, task
+
+def test_stream_pushes_a_new_notification(db, patron_headers):
+    patron = db.query(models.Patron).filter(models.Patron.username == "ahmet").one()
+
+    async def scenario():
+        chunks, disconnect, task = await open_stream(main.app, patron_headers["Authorization"])
+        try:
+            assert await asyncio.wait_for(chunks.get(), 10) == ("status", 200)
+            assert await asyncio.wait_for(chunks.get(), 10) == ("body", "retry: 5000\n\n")
+            notification = await asyncio.to_thread(
+                crud.create_notification, db, models.NotificationCreate(patron_id=patron.id, message="Pushed over SSE")
+            )
+            kind, frame = await asyncio.wait_for(chunks.get(), 10)
+        finally:
+            disconnect.set()
+            await asyncio.wait_for(task, 10)
+        return notification.id, frame
+
+    notification_id, frame = asyncio.run(scenario())
+    event, data = frame.rstrip("\n").split("\n")
+    assert event == "event: notification"
+    payload = json.loads(data[len("data: "):])
+    assert payload["id"] == notification_id
+    assert payload["message"] == "Pushed over SSE"
+    # The stream unsubscribed on disconnect, so publishing no longer targets the closed loop
+    assert not notification_bus.hub.enabled
+
+def test_publish_after_the_stream_loop_closed_does_not_raise():
+    hub = notification_bus.NotificationHub()
+
+    async def subscribe_and_leave():
+        await hub.subscribe(1)
+
+    # The loop ends with the stream still subscribed, as when a server stops
+    asyncio.run(subscribe_and_leave())
+    hub.publish(1, {"id": 1, "message": "after shutdown"})
+    assert not hub.enabled
+
+def test_unsubscribing_the_last_stream_and_close_forget_the_loop():
+    hub = notification_bus.NotificationHub()
+
+    async def scenario():
+        queue = await hub.subscribe(1)
+        assert hub.enabled
+        await hub.unsubscribe(1, queue)
+        assert not hub.enabled
+        await hub.subscribe(2)
+        await hub.close()
+        assert not hub.enabled
+
+    asyncio.run(scenario())
+    hub.publish(2, {"id": 2, "message": "after close"})
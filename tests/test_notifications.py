@@ -0,0 +1,53 @@
+from sqlalchemy import event
+from app import crud, models
+from app.database import engine
+
+def create_patron(db, username: str):
+    patron = models.Patron(username=username, hashed_password="x")
+    db.add(patron)
+    db.commit()
+    return patron
+
+def unread_rows(db, patron_id: int) -> int:
+    return db.query(models.Notification).filter(
+        models.Notification.patron_id == patron_id, models.Notification.is_read == False
+    ).count()
+
+def test_unread_counter_follows_create_read_and_delete(db):
+    patron = create_patron(db, "counter-basic")
+    first = crud.create_notification(db, models.NotificationCreate(patron_id=patron.id, message="one"))
+    crud.create_notification(db, models.NotificationCreate(patron_id=patron.id, message="two"))
+    assert crud.get_unread_notification_count(db, patron.id) == 2
+    assert crud.mark_notification_as_read(db, first.id, patron.id)
+    assert crud.get_unread_notification_count(db, patron.id) == 1
+    assert crud.mark_all_notifications_read(db, patron.id) == 1
+    assert crud.get_unread_notification_count(db, patron.id) == 0
+
+def test_mark_all_read_keeps_a_notification_inserted_concurrently(db):
+    patron = create_patron(db, "counter-race")
+    for message in ("one", "two"):
+        crud.create_notification(db, models.NotificationCreate(patron_id=patron.id, message=message))
+
+    # SQLite serializes writers, so replay the interleaving that READ COMMITTED allows on
+    # PostgreSQL: another transaction adds an unread notification and bumps the counter
+    # right after the notifications are marked and before the counter is updated.
+    inserted = []
+
+    def insert_after_mark(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE notifications") and not inserted:
+            inserted.append(True)
+            conn.exec_driver_sql(
+                "INSERT INTO notifications (patron_id, message, created_at, is_read) "
+                "VALUES (?, 'concurrent', CURRENT_TIMESTAMP, 0)", (patron.id,)
+            )
+            conn.exec_driver_sql(
+                "UPDATE patrons SET unread_notifications = unread_notifications + 1 WHERE id = ?", (patron.id,)
+            )
+
+    event.listen(engine, "after_cursor_execute", insert_after_mark)
+    try:
+        assert crud.mark_all_notifications_read(db, patron.id) == 2
+    finally:
+        event.remove(engine, "after_cursor_execute", insert_after_mark)
+    assert unread_rows(db, patron.id) == 1
+    assert crud.get_unread_notification_count(db, patron.id) == 1
@@ -0,0 +1,61 @@
+from sqlalchemy import event
+from app import crud, main, models
+from app.database import engine
+
+def create_book(db, title="Cache Test Book"):
+    return crud.create_book(db, models.BookCreate(title=title, author="Tester"))
+
+def test_catalog_version_is_bumped_in_its_own_transaction_after_the_loan(db):
+    book = create_book(db)
+    patron = db.query(models.Patron).filter(models.Patron.username == "ahmet").one()
+    version = crud.get_catalog_version(db)
+    db.commit()
+    steps = []
+
+    def on_statement(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE"):
+            steps.append(statement.split()[1])
+
+    def on_commit(conn):
+        steps.append("COMMIT")
+
+    event.listen(engine, "before_cursor_execute", on_statement)
+    event.listen(engine, "commit", on_commit)
+    try:
+        assert crud.checkout_book(db, book.id, patron.id) is not None
+    finally:
+        event.remove(engine, "before_cursor_execute", on_statement)
+        event.remove(engine, "commit", on_commit)
+    assert steps == ["books", "COMMIT", "catalog_state", "COMMIT"]
+    assert crud.get_catalog_version(db) == version + 1
+    crud.return_book(db, book.id)
+
+def test_main_page_answers_304_without_rendering(client, patron_headers, monkeypatch):
+    client.cookies.set("access_token", patron_headers["Authorization"])
+    try:
+        first = client.get("/")
+        etag = first.headers["etag"]
+
+        def fail_render(*args, **kwargs):
+            raise AssertionError("the page was rendered for a matching If-None-Match")
+
+        with monkeypatch.context() as patch:
+            patch.setattr(main.templates, "TemplateResponse", fail_render)
+            cached = client.get("/", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.headers["etag"] == etag
+        assert client.get("/").headers["etag"] == etag
+    finally:
+        client.cookies.clear()
+
+def test_main_page_etag_changes_with_the_catalog(client, db, patron_headers):
+    client.cookies.set("access_token", patron_headers["Authorization"])
+    try:
+        etag = client.get("/").headers["etag"]
+        book = create_book(db, "Another Cache Test Book")
+        response = client.get("/", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert book.title in response.text
+    finally:
+        client.cookies.clear()
@@ -0,0 +1,44 @@
+import pytest
+from datetime import datetime
+from app import pagination
+
+def test_cursor_round_trip():
+    token = pagination.encode_cursor({"sent_at": "2026-01-02T03:04:05", "id": 7})
+    assert pagination.decode_cursor(token, ("sent_at", "id")) == {"sent_at": datetime(2026, 1, 2, 3, 4, 5), "id": 7}
+
+def test_empty_cursor_is_none():
+    assert pagination.decode_cursor("") is None
+
+@pytest.mark.parametrize("values, keys", [
+    ({"id": "x"}, ("id",)),
+    ({"id": None}, ("id",)),
+    ({"id": True}, ("id",)),
+    ({"id": [1]}, ("id",)),
+    ({"id": 1.5}, ("id",)),
+    ({"sent_at": "yesterday", "id": 1}, ("sent_at", "id")),
+    ({"sent_at": 12, "id": 1}, ("sent_at", "id")),
+    ({"created_at": "2026-01-01T00:00:00", "id": "x"}, ("created_at", "id")),
+])
+def test_cursor_with_wrong_value_types_is_invalid(values, keys):
+    with pytest.raises(ValueError):
+        pagination.decode_cursor(pagination.encode_cursor(values), keys)
+
+def test_book_list_rejects_cursor_with_wrong_id_type(client):
+    # base64 of {"id":"x"}
+    response = client.get("/api/books/?cursor=eyJpZCI6IngifQ")
+    assert response.status_code == 400
+
+def test_email_log_list_rejects_cursor_with_wrong_timestamp(client):
+    cursor = pagination.encode_cursor({"sent_at": "not a date", "id": 1})
+    assert client.get(f"/api/emails/?cursor={cursor}").status_code == 400
+
+def test_notification_list_rejects_cursor_with_wrong_types(client, patron_headers):
+    cursor = pagination.encode_cursor({"created_at": 5, "id": "x"})
+    response = client.get(f"/api/notifications/?cursor={cursor}", headers=patron_headers)
+    assert response.status_code == 400
+
+def test_book_list_pages_with_valid_cursor(client):
+    first = client.get("/api/books/?cursor=&limit=3").json()
+    second = client.get(f"/api/books/?cursor={first['next_cursor']}&limit=3").json()
+    assert [book["id"] for book in second["items"]] and \
+        min(book["id"] for book in second["items"]) > max(book["id"] for book in first["items"])
@@ -0,0 +1,78 @@
+from datetime import date, datetime, timedelta
+import pytest
+from sqlalchemy import event
+from app import email_templates, models
+from app.database import engine
+
+# Statements each admin page may run, whatever the number of rows it lists
+BUDGETS = {
+    "/admin": 4,
+    "/admin/emails": 2,
+    "/admin/notifications": 2,
+}
+# Patrons listed by crud.get_patrons on the admin pages
+PATRON_PAGE_SIZE = 100
+
+def add_patron(db, username: str):
+    patron = models.Patron(username=username, hashed_password="x")
+    db.add(patron)
+    db.flush()
+    return patron
+
+def fill_first_patron_page(db):
+    """Adds filler patrons until the first page of crud.get_patrons is full."""
+    missing = PATRON_PAGE_SIZE - db.query(models.Patron).count()
+    for i in range(missing):
+        add_patron(db, f"budget-filler-{i}")
+    db.commit()
+
+def add_rows(db, count: int, tag: str):
+    """
+    Adds count overdue books, email log pairs (plain and templated) and notifications.
+    The admin pages load the first page of patrons before rendering, so the rows get new
+    patrons past that page: their patrons are only loaded by the page's own queries, and a
+    missing eager load shows up as one statement per row.
+    """
+    fill_first_patron_page(db)
+    template_id = email_templates.get_template_id(db, email_templates.OVERDUE_REMINDER)
+    for i in range(count):
+        borrower = add_patron(db, f"budget-{tag}-borrower-{i}")
+        db.add(models.Book(
+            title=f"Budget Book {tag}-{i}", author="Tester", patron_id=borrower.id,
+            due_date=date.today() - timedelta(days=16),
+        ))
+        recipient = add_patron(db, f"budget-{tag}-recipient-{i}")
+        db.add(models.EmailLog(
+            recipient_id=recipient.id, subject="Plain", message_text="Hello", email_type="test", sent_at=datetime.utcnow(),
+        ))
+        db.add(models.EmailLog(
+            recipient_id=recipient.id, subject="Overdue Book Reminder", template_id=template_id,
+            params=email_templates.dump_params({"username": recipient.username, "books": [["Budget", "Tester", "2020-01-01"]]}),
+            email_type="overdue_reminder", sent_at=datetime.utcnow(),
+        ))
+        reader = add_patron(db, f"budget-{tag}-reader-{i}")
+        db.add(models.Notification(patron_id=reader.id, message=f"Notification {tag}-{i}"))
+    db.commit()
+
+def count_statements(client, path: str) -> int:
+    statements = []
+
+    def on_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", on_statement)
+    try:
+        response = client.get(path)
+    finally:
+        event.remove(engine, "before_cursor_execute", on_statement)
+    assert response.status_code == 200
+    return len(statements)
+
+@pytest.mark.parametrize("path", sorted(BUDGETS))
+def test_admin_page_statement_count_does_not_grow_with_rows(client, db, path):
+    add_rows(db, 5, f"{path}-small")
+    before = count_statements(client, path)
+    add_rows(db, 20, f"{path}-large")
+    after = count_statements(client, path)
+    assert after == before, f"{path}: {before} -> {after}"
+    assert after <= BUDGETS[path]
@@ -0,0 +1,51 @@
+import re
+from sqlalchemy import event
+from app import crud, models
+from app.database import engine
+
+# EXPLAIN QUERY PLAN checks that the hot queries use the indexes of migration 0003
+# instead of scanning their table or sorting it.
+
+def query_plans(db, call):
+    """Runs call() and gets the SQLite query plan of every SELECT it executed."""
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    plans = []
+    for statement, parameters in statements:
+        rows = db.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()
+        plans.append(" | ".join(row[-1] for row in rows))
+    return plans
+
+def assert_uses_index(plan: str, table: str, index: str):
+    assert f"SEARCH {table} USING INDEX {index}" in plan or f"SCAN {table} USING INDEX {index}" in plan, plan
+    assert not re.search(rf"SCAN {table}(?! USING)", plan), plan
+    assert "USE TEMP B-TREE FOR ORDER BY" not in plan, plan
+
+def test_overdue_books_use_partial_due_date_index(db):
+    [plan] = query_plans(db, lambda: crud.get_overdue_books(db))
+    assert_uses_index(plan, "books", "ix_books_due_date_checked_out")
+
+def test_borrowed_books_of_patron_use_patron_id_index(db):
+    [plan] = query_plans(db, lambda: db.query(models.Book).filter_by(patron_id=1).all())
+    assert_uses_index(plan, "books", "ix_books_patron_id")
+
+def test_patron_inbox_uses_patron_id_created_at_index(db):
+    [plan] = query_plans(db, lambda: crud.get_notifications_for_patron(db, 1))
+    assert_uses_index(plan, "notifications", "ix_notifications_patron_id_created_at")
+
+def test_email_log_page_uses_sent_at_index(db):
+    [plan] = query_plans(db, lambda: crud.get_email_logs(db, limit=10))
+    assert_uses_index(plan, "email_logs", "ix_email_logs_sent_at_id")
+
+def test_email_logs_by_type_use_type_sent_at_index(db):
+    [plan] = query_plans(db, lambda: crud.get_email_logs_by_type(db, "overdue_reminder", limit=10))
+    assert_uses_index(plan, "email_logs", "ix_email_logs_email_type_sent_at_id")
@@ -0,0 +1,85 @@
+from datetime import date, timedelta
+import pytest
+from app import crud, models, reminder_schedule, tasks
+
+DUE = date(2026, 3, 1)
+
+@pytest.fixture
+def default_steps(monkeypatch):
+    """Runs a test with the default escalation steps, whatever REMINDER_ESCALATION_DAYS is set to."""
+    monkeypatch.setattr(reminder_schedule, "ESCALATION_DAYS", [1, 7, 14])
+
+def days(n: int) -> date:
+    return DUE + timedelta(days=n)
+
+def test_first_reminder_is_one_step_after_the_due_date(default_steps):
+    assert reminder_schedule.first_reminder_on(DUE) == days(1)
+    assert reminder_schedule.first_reminder_on(None) is None
+
+@pytest.mark.parametrize("reminded_on, expected", [
+    (days(0), (0, days(1))),    # not overdue yet
+    (days(1), (1, days(7))),    # first step
+    (days(7), (2, days(14))),   # second step
+    (days(10), (2, days(14))),  # between steps
+    (days(14), (3, None)),      # last step: no further reminders
+])
+def test_advance_moves_to_the_next_step(default_steps, reminded_on, expected):
+    assert reminder_schedule.advance(DUE, reminded_on) == expected
+
+def test_advance_skips_missed_steps(default_steps):
+    # The job did not run between day 1 and day 9: the day 7 step is not sent late
+    assert reminder_schedule.advance(DUE, days(9)) == (2, days(14))
+    # Reminded first on day 20, every step has passed
+    assert reminder_schedule.advance(DUE, days(20)) == (3, None)
+
+def test_incremental_run_moves_a_due_loan_to_its_next_step(db, default_steps):
+    patron = models.Patron(username="escalation", hashed_password="x")
+    db.add(patron)
+    db.flush()
+    today = date.today()
+    due = today - timedelta(days=1)
+    book = models.Book(title="Escalation Book", author="Tester", patron_id=patron.id, due_date=due,
+                       next_reminder_on=reminder_schedule.first_reminder_on(due))
+    db.add(book)
+    db.commit()
+    try:
+        stats = tasks.send_reminders_for_range(db, patron.id, patron.id, today, incremental=True)
+        assert stats["sent"] == 1
+        db.refresh(book)
+        assert (book.reminder_level, book.last_reminded_on, book.next_reminder_on) == (1, today, due + timedelta(days=7))
+        # Not due again until its next step
+        stats = tasks.send_reminders_for_range(db, patron.id, patron.id, today, incremental=True)
+        assert stats["overdue_books"] == 0
+    finally:
+        crud.return_book(db, book.id)
+
+def set_watermark(db, day):
+    state = db.get(models.ReminderState, 1)
+    state.watermark = day
+    db.commit()
+
+def test_incremental_coordinator_skips_days_at_or_below_the_watermark(db, monkeypatch):
+    monkeypatch.setattr(reminder_schedule, "REMINDER_MODE", "incremental")
+    planned = []
+
+    def plan(db, incremental=False, today=None):
+        planned.append((incremental, today))
+        return []
+
+    monkeypatch.setattr(tasks, "plan_reminder_chunks", plan)
+    today = date.today()
+    try:
+        # Below today: the day is planned, and with nothing due the watermark moves to today
+        set_watermark(db, today - timedelta(days=1))
+        tasks.send_overdue_reminders()
+        assert planned == [(True, today)]
+        db.expire_all()
+        assert crud.get_reminder_watermark(db) == today
+
+        # At or above today: already processed, nothing is planned
+        tasks.send_overdue_reminders()
+        set_watermark(db, today + timedelta(days=1))
+        tasks.send_overdue_reminders()
+        assert planned == [(True, today)]
+    finally:
+        set_watermark(db, None)
@@ -0,0 +1,77 @@
+from datetime import date, timedelta
+from app import crud, models, tasks
+
+def add_overdue_loans(db, username: str, count: int, days_overdue: int):
+    """Adds a patron with count books that went overdue days_overdue days ago."""
+    patron = models.Patron(username=username, hashed_password="x")
+    db.add(patron)
+    db.flush()
+    books = [
+        models.Book(title=f"{username} book {i}", author="Tester", patron_id=patron.id,
+                    due_date=date.today() - timedelta(days=days_overdue))
+        for i in range(count)
+    ]
+    db.add_all(books)
+    db.commit()
+    return patron, books
+
+def reminder_rows(db, patron_id: int):
+    return (
+        db.query(models.EmailLog).filter(models.EmailLog.recipient_id == patron_id).count(),
+        db.query(models.Notification).filter(models.Notification.patron_id == patron_id).count(),
+    )
+
+def test_reminder_chunk_selects_loans_overdue_on_its_planned_day(db):
+    patron, (book,) = add_overdue_loans(db, "reminder-day", 1, days_overdue=1)
+    planned_before_due = date.today() - timedelta(days=3)
+    try:
+        # A chunk planned (or retried) for a day before the due date sends nothing
+        chunks = tasks.plan_reminder_chunks(db, today=planned_before_due)
+        assert not any(first <= patron.id <= last for first, last in chunks)
+        stats = tasks.send_reminders_for_range(db, patron.id, patron.id, planned_before_due)
+        assert stats["overdue_books"] == 0
+        assert stats["sent"] == 0
+
+        stats = tasks.send_reminders_for_range(db, patron.id, patron.id, date.today())
+        assert stats["overdue_books"] == 1
+        assert stats["sent"] == 1
+        assert stats["rows_written"] == 2
+        assert stats["rows_per_second"] > 0
+    finally:
+        crud.return_book(db, book.id)
+
+def test_reminder_summary_reports_rows_per_second(capsys):
+    results = [
+        {"overdue_books": 2, "sent": 2, "rows_written": 4, "elapsed_seconds": 0.5, "rows_per_second": 8.0},
+        {"overdue_books": 1, "sent": 1, "rows_written": 2, "elapsed_seconds": 2.0, "rows_per_second": 1.0},
+    ]
+    summary = tasks.summarize_overdue_reminders(results, date.today().isoformat())
+    assert summary["rows_written"] == 6
+    assert summary["elapsed_seconds"] == 2.0
+    assert summary["rows_per_second"] == 3.0
+    assert "Wrote 6 rows in 2.00s (3 rows/s)" in capsys.readouterr().out
+
+def test_rerunning_a_chunk_for_the_same_day_sends_nothing_again(db):
+    patron, books = add_overdue_loans(db, "reminder-rerun", 2, days_overdue=3)
+    today = date.today()
+    try:
+        first = tasks.send_reminders_for_range(db, patron.id, patron.id, today)
+        assert (first["sent"], first["already_sent"]) == (1, 0)
+        assert reminder_rows(db, patron.id) == (1, 1)
+
+        # A retried chunk or a second beat trigger for the same day
+        second = tasks.send_reminders_for_range(db, patron.id, patron.id, today)
+        assert second["overdue_books"] == 2
+        assert second["sent"] == 0
+        assert second["already_sent"] == 2
+        assert second["rows_written"] == 0
+        assert reminder_rows(db, patron.id) == (1, 1)
+        assert crud.get_unread_notification_count(db, patron.id) == 1
+
+        # The claims are per day: the next day's run reminds again
+        next_day = tasks.send_reminders_for_range(db, patron.id, patron.id, today + timedelta(days=1))
+        assert (next_day["sent"], next_day["already_sent"]) == (1, 0)
+        assert reminder_rows(db, patron.id) == (2, 2)
+    finally:
+        for book in books:
+            crud.return_book(db, book.id)